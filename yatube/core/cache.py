@@ -0,0 +1,318 @@
+"""
+Двухуровневый кеш.
+
+L1 — ограниченный LRU в памяти процесса с коротким временем жизни,
+L2 — общий для всех воркеров файл SQLite. Каждая запись и удаление
+добавляет строку в таблицу инвалидаций; воркеры читают её не чаще
+раза в SYNC_INTERVAL секунд и выбрасывают устаревшие ключи из L1.
+
+get_or_recompute защищает от лавины перестроений: запись считается
+устаревшей чуть раньше срока с вероятностью, растущей к его концу,
+перестраивает её только владелец блокировки, а остальные получают
+прежнее значение.
+"""
+import math
+import os
+import pickle
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core import metrics, sqlite
+
+FRAGMENT_KEY_PREFIX = 'template.cache.'
+PRUNE_INTERVAL = 60
+STALE_GRACE = 60
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.05
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entries ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE TABLE IF NOT EXISTS cache_invalidations ('
+    'seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, origin TEXT, '
+    'created REAL NOT NULL)',
+)
+
+
+class LocalTier:
+    """L1 процесса: общий для всех потоков, как у LocMemCache"""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Новое состояние, в том числе после fork воркера"""
+        self.entries.clear()
+        self.pid = os.getpid()
+        self.origin = f'{self.pid}-{uuid.uuid4().hex}'
+        self.seen = None
+        self.last_sync = 0.0
+        self.last_prune = 0.0
+
+
+_tiers = {}
+
+
+def cache_label(key):
+    return 'fragment' if FRAGMENT_KEY_PREFIX in key else 'default'
+
+
+class TwoTierCache(BaseCache):
+    """Кеш с L1 в памяти процесса и общим L2 в SQLite"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._l1_max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        self._l1_timeout = options.get('L1_TIMEOUT', 5)
+        self._sync_interval = options.get('SYNC_INTERVAL', 0.5)
+        self._keep_invalidations = max(60, self._l1_timeout * 2)
+        self._tier = _tiers.setdefault(location, LocalTier())
+        self._l1 = self._tier.entries
+        self._lock = self._tier.lock
+
+    def _connect(self):
+        connection = sqlite.connect(self._path)
+        tier = self._tier
+        if tier.pid != os.getpid():
+            tier.reset()
+        if tier.seen is None:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            tier.seen = connection.execute(
+                'SELECT COALESCE(MAX(seq), 0) FROM cache_invalidations'
+            ).fetchone()[0]
+        return connection
+
+    def _sync(self):
+        """Применяет к L1 инвалидации, сделанные другими воркерами"""
+        tier = self._tier
+        now = time.monotonic()
+        if now - tier.last_sync < self._sync_interval:
+            return
+        tier.last_sync = now
+        connection = self._connect()
+        with self._lock:
+            rows = connection.execute(
+                'SELECT seq, key, origin FROM cache_invalidations '
+                'WHERE seq > ? ORDER BY seq', (tier.seen,)
+            ).fetchall()
+            if not rows:
+                return
+            if rows[0][0] != tier.seen + 1:
+                self._l1.clear()
+            for seq, key, origin in rows:
+                if origin == tier.origin:
+                    continue
+                if key is None:
+                    self._l1.clear()
+                else:
+                    self._l1.pop(key, None)
+            tier.seen = rows[-1][0]
+
+    def _invalidate(self, connection, key):
+        now = time.time()
+        connection.execute(
+            'INSERT INTO cache_invalidations (key, origin, created) '
+            'VALUES (?, ?, ?)', (key, self._tier.origin, now)
+        )
+        if now - self._tier.last_prune >= PRUNE_INTERVAL:
+            self._tier.last_prune = now
+            connection.execute(
+                'DELETE FROM cache_invalidations WHERE created < ?',
+                (now - self._keep_invalidations,)
+            )
+            connection.execute(
+                'DELETE FROM cache_entries WHERE expires <= ?', (now,)
+            )
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return entry[1]
+
+    def _l1_set(self, key, pickled, expires):
+        local_expires = time.time() + self._l1_timeout
+        if expires is not None:
+            local_expires = min(local_expires, expires)
+        with self._lock:
+            self._l1[key] = (local_expires, pickled)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, key):
+        with self._lock:
+            self._l1.pop(key, None)
+
+    def _l2_get(self, key):
+        row = self._connect().execute(
+            'SELECT value, expires FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None, None
+        return row
+
+    def _write(self, key, value, timeout, only_if_missing=False):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        connection = self._connect()
+        with sqlite.transaction(connection):
+            sql = (
+                'INSERT INTO cache_entries (key, value, expires) '
+                'VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+                'value = excluded.value, expires = excluded.expires'
+            )
+            params = (key, pickled, expires)
+            if only_if_missing:
+                sql += (' WHERE cache_entries.expires IS NOT NULL '
+                        'AND cache_entries.expires <= ?')
+                params += (time.time(),)
+            written = connection.execute(sql, params).rowcount > 0
+            if written:
+                self._invalidate(connection, key)
+        if written:
+            self._l1_set(key, pickled, expires)
+        return written
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._sync()
+        pickled = self._l1_get(key)
+        if pickled is not None:
+            metrics.CACHE_L1_HITS.inc(cache=cache_label(key))
+        else:
+            pickled, expires = self._l2_get(key)
+            if pickled is not None:
+                self._l1_set(key, pickled, expires)
+        metrics.CACHE_REQUESTS.inc(
+            cache=cache_label(key),
+            result='miss' if pickled is None else 'hit'
+        )
+        if pickled is None:
+            return default
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write(key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._write(key, value, timeout, only_if_missing=True)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        touched = self._connect().execute(
+            'UPDATE cache_entries SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time())
+        ).rowcount > 0
+        return touched
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connect()
+        with sqlite.transaction(connection):
+            pickled, expires = self._l2_get(key)
+            if pickled is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(pickled) + delta
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                'UPDATE cache_entries SET value = ? WHERE key = ?',
+                (pickled, key)
+            )
+            self._invalidate(connection, key)
+        self._l1_set(key, pickled, expires)
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._sync()
+        return (self._l1_get(key) is not None
+                or self._l2_get(key)[0] is not None)
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connect()
+        with sqlite.transaction(connection):
+            connection.execute(
+                'DELETE FROM cache_entries WHERE key = ?', (key,)
+            )
+            self._invalidate(connection, key)
+        self._l1_delete(key)
+
+    def clear(self):
+        connection = self._connect()
+        with sqlite.transaction(connection):
+            connection.execute('DELETE FROM cache_entries')
+            self._invalidate(connection, None)
+        with self._lock:
+            self._l1.clear()
+
+
+def _store(backend, key, value, delta, timeout):
+    expires = time.time() + timeout
+    backend.set(key, (value, delta, expires), timeout + STALE_GRACE)
+
+
+def _recompute(backend, key, compute, timeout):
+    start = time.monotonic()
+    value = compute()
+    _store(backend, key, value, time.monotonic() - start, timeout)
+    return value
+
+
+def get_or_recompute(key, compute, timeout, beta=1.0, cache=None):
+    """
+    Значение из кеша или результат compute() без лавины перестроений.
+
+    Запись хранится STALE_GRACE секунд после истечения timeout, чтобы
+    пока один запрос её перестраивает, остальные отдавали старую.
+    """
+    backend = cache or caches['default']
+    lock_key = f'{key}.lock'
+    entry = backend.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        jitter = -delta * beta * math.log(1 - random.random())
+        if time.time() + jitter < expires:
+            return value
+        if not backend.add(lock_key, True, LOCK_TIMEOUT):
+            return value
+    elif not backend.add(lock_key, True, LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL)
+            entry = backend.get(key)
+            if entry is not None:
+                return entry[0]
+        return _recompute(backend, key, compute, timeout)
+    try:
+        return _recompute(backend, key, compute, timeout)
+    finally:
+        backend.delete(lock_key)
@@ -0,0 +1,56 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger('yatube.slow_queries')
+
+
+def explain(connection, sql, params):
+    """
+    План выполнения запроса или пустой список.
+
+    EXPLAIN выполняется без обёрток курсора запроса, чтобы не попасть
+    ни в журнал, ни в метрики представления.
+    """
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return []
+    prefix = (
+        'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    )
+    wrappers, connection.execute_wrappers = connection.execute_wrappers, []
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return [str(row[-1]) for row in cursor.fetchall()]
+    except Exception as error:
+        return [f'EXPLAIN failed: {error}']
+    finally:
+        connection.execute_wrappers = wrappers
+
+
+class SlowQueryLogger:
+    """Обёртка курсора, записывающая медленные запросы с их планом"""
+
+    def __init__(self, view_name):
+        self.view_name = view_name
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            if duration >= settings.SLOW_QUERY_THRESHOLD_MS:
+                self.log(context['connection'], sql, params, many, duration)
+
+    def log(self, connection, sql, params, many, duration):
+        record = {
+            'time_ms': round(duration, 3),
+            'view': self.view_name(),
+            'sql': sql,
+            'params': None if many else params,
+            'plan': [] if many else explain(connection, sql, params),
+        }
+        logger.warning(json.dumps(record, default=str, ensure_ascii=False))
@@ -0,0 +1,140 @@
+"""
+Сжатый текст в базе.
+
+CompressedTextField хранит строку в BLOB с первым байтом-флагом:
+RAW — дальше UTF-8 как есть, ZLIB — дальше сжатые zlib байты.
+Сжимаются только значения длиннее COMPRESSED_TEXT_THRESHOLD байт
+и только если сжатие действительно выигрывает. Из базы приходят
+сырые байты, а распаковка происходит при первом обращении к полю,
+поэтому строки, которые страница не показывает, не распаковываются.
+Значения в старом формате (обычный текст) читаются как есть, их
+переводит команда compress_text.
+"""
+import zlib
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.query_utils import DeferredAttribute
+
+RAW = b'\x00'
+ZLIB = b'\x01'
+
+
+def encode(text):
+    """Строка -> байты для базы с флагом в первом байте"""
+    data = text.encode()
+    if len(data) >= settings.COMPRESSED_TEXT_THRESHOLD:
+        packed = zlib.compress(data, settings.COMPRESSED_TEXT_LEVEL)
+        if len(packed) < len(data):
+            return ZLIB + packed
+    return RAW + data
+
+
+def decode(value):
+    """Байты из базы -> строка; обычный текст возвращается как есть"""
+    if isinstance(value, str):
+        return value
+    value = bytes(value)
+    if value[:1] == ZLIB:
+        return zlib.decompress(value[1:]).decode()
+    if value[:1] == RAW:
+        return value[1:].decode()
+    return value.decode()
+
+
+def stored_size(value):
+    if isinstance(value, str):
+        return len(value.encode())
+    return len(value)
+
+
+class CompressedText(DeferredAttribute):
+    """
+    Распаковывает значение при первом чтении и запоминает строку.
+
+    Дескриптор данных: иначе значение из __dict__ экземпляра
+    возвращалось бы в обход __get__.
+    """
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if not isinstance(value, str):
+            value = decode(value)
+            instance.__dict__[self.field_name] = value
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field_name] = value
+
+
+class CompressedTextField(models.BinaryField):
+    """Текстовое поле, которое хранит длинные значения сжатыми"""
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        setattr(cls, self.attname, CompressedText(self.attname))
+
+    def get_default(self):
+        if not self.has_default():
+            return ''
+        return super().get_default()
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, str):
+            return value
+        return bytes(value)
+
+    def get_prep_value(self, value):
+        if isinstance(value, str):
+            return encode(value)
+        return value
+
+    def to_python(self, value):
+        if value is None:
+            return value
+        return decode(value)
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+
+def compressed_fields():
+    """Все пары (модель, поле) со сжатым текстом"""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, CompressedTextField):
+                yield model, field
+
+
+def compress_rows(model, field, batch_size):
+    """
+    Перекодирует значения поля порциями по первичному ключу.
+
+    Возвращает (изменено строк, байт до, байт после) по всем строкам.
+    """
+    rows = model._base_manager.order_by('pk').values_list(
+        'pk', field.attname
+    )
+    changed = before = after = 0
+    last_pk = None
+    while True:
+        batch = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return changed, before, after
+        last_pk = batch[-1][0]
+        with transaction.atomic():
+            for pk, value in batch:
+                if value is None:
+                    continue
+                stored = encode(decode(value))
+                before += stored_size(value)
+                after += len(stored)
+                if stored != value:
+                    model._base_manager.filter(pk=pk).update(
+                        **{field.attname: stored}
+                    )
+                    changed += 1
@@ -0,0 +1,127 @@
+"""
+Отложенная отправка почты.
+
+QueuedEmailBackend сохраняет письма в OutgoingEmail и сразу
+возвращает управление. Задача core.tasks.send_queued_emails
+отправляет их пачками через одно соединение настоящего бэкенда
+EMAIL_DELIVERY_BACKEND и повторяет неудачные попытки позже.
+"""
+import logging
+import pickle
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils import timezone
+
+from core.metrics import EMAIL_BATCH_LATENCY, EMAILS
+from core.models import OutgoingEmail
+
+logger = logging.getLogger('yatube.mail')
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Кладёт письма в очередь вместо отправки"""
+
+    def send_messages(self, email_messages):
+        rows = []
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            message.connection = None
+            rows.append(OutgoingEmail(
+                message=pickle.dumps(message, pickle.HIGHEST_PROTOCOL),
+                recipients=', '.join(message.recipients()),
+                subject=str(message.subject)[:255],
+            ))
+        if not rows:
+            return 0
+        OutgoingEmail.objects.bulk_create(rows)
+        EMAILS.inc(len(rows), result='queued')
+        from core.tasks import send_queued_emails
+        send_queued_emails.delay(dedup_key='mail.send', priority=10)
+        return len(rows)
+
+
+def claim(batch_size):
+    """Забирает пачку готовых писем, которые никто не отправляет"""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.EMAIL_SEND_TIMEOUT)
+    OutgoingEmail.objects.filter(
+        status=OutgoingEmail.SENDING, claimed_at__lt=stale
+    ).update(status=OutgoingEmail.QUEUED, claimed_by='')
+    token = uuid.uuid4().hex
+    ids = list(
+        OutgoingEmail.objects.filter(
+            status=OutgoingEmail.QUEUED, next_attempt__lte=now
+        ).order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    OutgoingEmail.objects.filter(
+        id__in=ids, status=OutgoingEmail.QUEUED
+    ).update(status=OutgoingEmail.SENDING, claimed_by=token, claimed_at=now)
+    return list(OutgoingEmail.objects.filter(claimed_by=token))
+
+
+def deliver(connection, emails):
+    """Отправляет пачку через открытое соединение"""
+    for email in emails:
+        try:
+            connection.send_messages([pickle.loads(email.message)])
+        except Exception as error:
+            email.attempts += 1
+            email.last_error = repr(error)
+            if email.attempts < settings.EMAIL_MAX_ATTEMPTS:
+                email.status = OutgoingEmail.QUEUED
+                email.next_attempt = timezone.now() + timedelta(
+                    seconds=settings.EMAIL_RETRY_BACKOFF
+                    * 2 ** (email.attempts - 1)
+                )
+                result = 'retry'
+            else:
+                email.status = OutgoingEmail.FAILED
+                result = 'failed'
+            logger.warning('Письмо %s не отправлено: %r', email.pk, error)
+        else:
+            email.status = OutgoingEmail.SENT
+            email.sent = timezone.now()
+            result = 'sent'
+        email.claimed_by = ''
+        email.save(update_fields=[
+            'status', 'attempts', 'last_error', 'next_attempt',
+            'claimed_by', 'sent',
+        ])
+        EMAILS.inc(result=result)
+
+
+def send_pending():
+    """
+    Отправляет все готовые письма и возвращает их число.
+
+    Пачки по EMAIL_BATCH_SIZE идут через одно соединение, которое
+    открывается один раз на весь вызов.
+    """
+    connection = get_connection(settings.EMAIL_DELIVERY_BACKEND)
+    processed = 0
+    try:
+        connection.open()
+        while True:
+            emails = claim(settings.EMAIL_BATCH_SIZE)
+            if not emails:
+                break
+            with EMAIL_BATCH_LATENCY.time():
+                deliver(connection, emails)
+            processed += len(emails)
+    finally:
+        connection.close()
+    return processed
+
+
+def next_retry():
+    """Время ближайшего повтора или None"""
+    return (
+        OutgoingEmail.objects.filter(status=OutgoingEmail.QUEUED)
+        .order_by('next_attempt')
+        .values_list('next_attempt', flat=True).first()
+    )
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.fields import compress_rows, compressed_fields
+
+
+def kilobytes(size):
+    return f'{size / 1024:.1f} КБ'
+
+
+class Command(BaseCommand):
+    help = 'Сжимает существующие значения сжатых текстовых полей порциями'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.COMPRESSED_TEXT_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        total_before = total_after = 0
+        for model, field in compressed_fields():
+            changed, before, after = compress_rows(
+                model, field, options['batch_size']
+            )
+            total_before += before
+            total_after += after
+            self.stdout.write(
+                f'{model._meta.label}.{field.name}: изменено строк '
+                f'{changed}, {kilobytes(before)} → {kilobytes(after)}'
+            )
+        saved = total_before - total_after
+        share = saved / total_before if total_before else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Сэкономлено {kilobytes(saved)} ({share:.0%})'
+        ))
@@ -0,0 +1,71 @@
+import json
+import os
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+PLACEHOLDER_LIST = re.compile(r'\((?:%s, )+%s\)')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    return PLACEHOLDER_LIST.sub('(...)', WHITESPACE.sub(' ', sql).strip())
+
+
+def log_files(path):
+    """Текущий журнал и его ротированные копии"""
+    files = [path]
+    index = 1
+    while os.path.exists(f'{path}.{index}'):
+        files.append(f'{path}.{index}')
+        index += 1
+    return [name for name in files if os.path.exists(name)]
+
+
+def read_records(path):
+    for name in log_files(path):
+        with open(name, encoding='utf-8') as log:
+            for line in log:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+class Command(BaseCommand):
+    help = 'Сводка по медленным запросам к БД по убыванию общего времени'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--view', help='Только запросы из представления')
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG)
+
+    def handle(self, *args, **options):
+        stats = defaultdict(lambda: {
+            'count': 0, 'total': 0.0, 'max': 0.0, 'views': set(), 'plan': []
+        })
+        for record in read_records(options['log']):
+            if options['view'] and record.get('view') != options['view']:
+                continue
+            entry = stats[normalize(record['sql'])]
+            entry['count'] += 1
+            entry['total'] += record['time_ms']
+            entry['max'] = max(entry['max'], record['time_ms'])
+            entry['views'].add(record.get('view') or '-')
+            entry['plan'] = record.get('plan') or entry['plan']
+        top = sorted(
+            stats.items(), key=lambda item: item[1]['total'], reverse=True
+        )[:options['limit']]
+        if not top:
+            self.stdout.write('Медленных запросов не найдено')
+        for sql, entry in top:
+            self.stdout.write(
+                f"{entry['total']:.1f} ms всего, {entry['count']} раз, "
+                f"макс. {entry['max']:.1f} ms, "
+                f"представления: {', '.join(sorted(entry['views']))}"
+            )
+            self.stdout.write(f'  {sql}')
+            for step in entry['plan']:
+                self.stdout.write(f'    {step}')
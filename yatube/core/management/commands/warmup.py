@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core import warmup
+
+
+class Command(BaseCommand):
+    help = 'Прогревает шаблоны, адреса, ленивые модули и кеши лент'
+
+    def handle(self, *args, **options):
+        total = 0
+        for phase, duration, detail in warmup.run():
+            total += duration
+            self.stdout.write(
+                f'{phase:<10} {duration * 1000:>9.1f} ms  {detail}'
+            )
+        self.stdout.write(f'{"всего":<10} {total * 1000:>9.1f} ms')
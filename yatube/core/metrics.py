@@ -0,0 +1,238 @@
+"""
+Метрики в формате Prometheus.
+
+Каждый процесс копит приращения в памяти и периодически сбрасывает
+их в общий файл SQLite, поэтому /metrics отдаёт сумму по всем воркерам.
+Если файл занят или недоступен, приращения остаются в буфере до
+следующего сброса, а запрос, во время которого сбрасывали, не падает.
+"""
+import logging
+import math
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from core import sqlite
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+logger = logging.getLogger('yatube.metrics')
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS metric_families ('
+    'name TEXT PRIMARY KEY, kind TEXT NOT NULL, help TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS metric_samples ('
+    'name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, '
+    'PRIMARY KEY (name, labels))',
+)
+UPSERT_SAMPLE = (
+    'INSERT INTO metric_samples (name, labels, value) VALUES (?, ?, ?) '
+    'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value'
+)
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def _format_labels(labels):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+def _format_bound(bound):
+    return '+Inf' if math.isinf(bound) else repr(float(bound))
+
+
+class Registry:
+    """Буфер приращений процесса и чтение общего хранилища"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def register(self, metric):
+        self._families[metric.name] = metric
+        return metric
+
+    def add(self, name, labels, value):
+        key = (name, _format_labels(labels))
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + value
+
+    def _connect(self):
+        connection = sqlite.connect(
+            settings.METRICS_DB, timeout=settings.METRICS_DB_TIMEOUT
+        )
+        for statement in SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    def flush(self):
+        """Сбрасывает буфер в хранилище; при ошибке возвращает его"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return True
+        try:
+            connection = self._connect()
+            with sqlite.transaction(connection):
+                connection.executemany(
+                    'INSERT OR REPLACE INTO metric_families '
+                    'VALUES (?, ?, ?)',
+                    [(m.name, m.kind, m.help)
+                     for m in self._families.values()]
+                )
+                connection.executemany(
+                    UPSERT_SAMPLE,
+                    [(name, labels, value)
+                     for (name, labels), value in pending.items()]
+                )
+        except sqlite3.Error:
+            logger.warning('Метрики не сброшены в %s', settings.METRICS_DB,
+                           exc_info=True)
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + value
+            return False
+        return True
+
+    def flush_if_due(self):
+        interval = settings.METRICS_FLUSH_INTERVAL
+        if time.monotonic() - self._last_flush >= interval:
+            self.flush()
+
+    def reset(self):
+        with self._lock:
+            self._pending = {}
+        connection = self._connect()
+        connection.execute('DELETE FROM metric_samples')
+
+    def exposition(self):
+        """Все метрики в текстовом формате Prometheus"""
+        self.flush()
+        connection = self._connect()
+        families = connection.execute(
+            'SELECT name, kind, help FROM metric_families ORDER BY name'
+        ).fetchall()
+        lines = []
+        for name, kind, help_text in families:
+            samples = connection.execute(
+                'SELECT name, labels, value FROM metric_samples '
+                'WHERE name = ? OR name GLOB ? ORDER BY name, labels',
+                (name, f'{name}_*')
+            ).fetchall()
+            if not samples:
+                continue
+            lines.append(f'# HELP {name} {_escape(help_text)}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample, labels, value in samples:
+                series = f'{sample}{{{labels}}}' if labels else sample
+                lines.append(f'{series} {value!r}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        REGISTRY.register(self)
+
+    def _labels(self, labels):
+        return [(name, labels[name]) for name in self.labelnames]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, value=1, **labels):
+        REGISTRY.add(f'{self.name}_total', self._labels(labels), value)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        base = self._labels(labels)
+        for bound in self.buckets:
+            REGISTRY.add(
+                f'{self.name}_bucket',
+                base + [('le', _format_bound(bound))],
+                1 if value <= bound else 0
+            )
+        REGISTRY.add(f'{self.name}_sum', base, value)
+        REGISTRY.add(f'{self.name}_count', base, 1)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+REQUEST_LATENCY = Histogram(
+    'yatube_request_duration_seconds',
+    'Время обработки запроса по имени представления', ('view',)
+)
+RESPONSES = Counter(
+    'yatube_responses', 'Ответы по коду статуса', ('status',)
+)
+DB_QUERIES = Histogram(
+    'yatube_db_queries_per_request',
+    'Число запросов к БД за один HTTP-запрос', ('view',),
+    buckets=QUERY_BUCKETS
+)
+DB_QUERY_LATENCY = Histogram(
+    'yatube_db_query_duration_seconds', 'Время выполнения запроса к БД'
+)
+CACHE_REQUESTS = Counter(
+    'yatube_cache_requests', 'Обращения к кешам', ('cache', 'result')
+)
+CACHE_L1_HITS = Counter(
+    'yatube_cache_l1_hits', 'Попадания в L1 кеша процесса', ('cache',)
+)
+UPLOAD_LATENCY = Histogram(
+    'yatube_upload_duration_seconds', 'Время сохранения загруженных файлов'
+)
+IMAGE_PROCESSING_LATENCY = Histogram(
+    'yatube_image_processing_duration_seconds',
+    'Время обработки изображений', ('operation',)
+)
+TASKS_PROCESSED = Counter(
+    'yatube_tasks_processed', 'Выполненные фоновые задачи',
+    ('task', 'result')
+)
+TASK_LATENCY = Histogram(
+    'yatube_task_duration_seconds', 'Время выполнения фоновых задач',
+    ('task',)
+)
+EMAILS = Counter(
+    'yatube_emails', 'Исходящие письма по результату', ('result',)
+)
+EMAIL_BATCH_LATENCY = Histogram(
+    'yatube_email_batch_duration_seconds', 'Время отправки пачки писем'
+)
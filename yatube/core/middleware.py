@@ -0,0 +1,144 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+
+from core import metrics
+from core.db import SlowQueryLogger
+
+
+class QueryCounter:
+    """Обёртка курсора, считающая запросы и их время"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            metrics.DB_QUERY_LATENCY.observe(time.perf_counter() - start)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+class MetricsMiddleware:
+    """Метрики задержки, кодов ответа и запросов к БД"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        name = view_name(request)
+        metrics.REQUEST_LATENCY.observe(
+            time.perf_counter() - start, view=name
+        )
+        metrics.RESPONSES.inc(status=response.status_code)
+        metrics.DB_QUERIES.observe(queries.count, view=name)
+        metrics.REGISTRY.flush_if_due()
+        return response
+
+
+class SlowQueryLogMiddleware:
+    """Журнал медленных запросов к БД с указанием представления"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        wrapper = SlowQueryLogger(lambda: view_name(request))
+        with connection.execute_wrapper(wrapper):
+            return self.get_response(request)
+
+
+class ProfilingMiddleware:
+    """Профилирование запроса сотрудником: ?_profile=cprofile|tracemalloc"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.profilers = {
+            'cprofile': self.profile_cpu,
+            'tracemalloc': self.profile_memory,
+        }
+
+    def __call__(self, request):
+        profiler = self.profilers.get(request.GET.get('_profile'))
+        if profiler is None or not request.user.is_staff:
+            return self.get_response(request)
+        request.GET = request.GET.copy()
+        del request.GET['_profile']
+        sort = request.GET.pop('_sort', ['cumulative'])[-1]
+        return profiler(request, sort)
+
+    def profile_cpu(self, request, sort):
+        if sort not in pstats.Stats.sort_arg_dict_default:
+            sort = 'cumulative'
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        response = profiler.runcall(self.get_response, request)
+        duration = time.perf_counter() - start
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats(sort).print_stats(settings.PROFILING_TOP)
+        saved = self.save(profiler, request)
+        return self.report(request, response, duration, stream.getvalue(),
+                           saved)
+
+    def profile_memory(self, request, sort):
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(settings.PROFILING_TRACEMALLOC_FRAMES)
+        before = tracemalloc.take_snapshot()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            duration = time.perf_counter() - start
+            after = tracemalloc.take_snapshot()
+        finally:
+            if started:
+                tracemalloc.stop()
+        key = 'traceback' if sort == 'traceback' else 'lineno'
+        top = after.compare_to(before, key)[:settings.PROFILING_TOP]
+        text = '\n'.join(str(stat) for stat in top)
+        return self.report(request, response, duration, text)
+
+    def save(self, profiler, request):
+        if not settings.PROFILING_DIR:
+            return None
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        name = view_name(request).replace(':', '-')
+        path = os.path.join(
+            settings.PROFILING_DIR, f'{name}-{time.strftime("%Y%m%d-%H%M%S")}'
+            f'-{os.getpid()}.prof'
+        )
+        profiler.dump_stats(path)
+        return path
+
+    def report(self, request, response, duration, text, saved=None):
+        header = [
+            f'{request.method} {request.get_full_path()}',
+            f'Представление: {view_name(request)}',
+            f'Статус ответа: {response.status_code}',
+            f'Время: {duration * 1000:.1f} ms',
+        ]
+        if saved:
+            header.append(f'Профиль сохранён: {saved}')
+        return HttpResponse(
+            '\n'.join(header) + '\n\n' + text,
+            content_type='text/plain; charset=utf-8'
+        )
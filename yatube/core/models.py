@@ -0,0 +1,63 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutgoingEmail(models.Model):
+    """Письмо, ожидающее отправки фоновым отправителем"""
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (SENDING, 'Отправляется'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    message = models.BinaryField(verbose_name='Письмо')
+    recipients = models.TextField(verbose_name='Получатели')
+    subject = models.CharField(max_length=255, verbose_name='Тема')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+        db_index=True,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток'
+    )
+    next_attempt = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Следующая попытка'
+    )
+    claimed_by = models.CharField(
+        max_length=32,
+        blank=True,
+        verbose_name='Отправитель'
+    )
+    claimed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Взято в отправку'
+    )
+    last_error = models.TextField(blank=True, verbose_name='Ошибка')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создано'
+    )
+    sent = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Отправлено'
+    )
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+
+    def __str__(self):
+        return self.subject
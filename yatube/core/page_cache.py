@@ -0,0 +1,102 @@
+"""
+Кеш целых страниц с «дырками» под персональные фрагменты.
+
+Страница рендерится один раз для всех пользователей: вместо шапки,
+кнопок подписки, формы комментария и прочего, что зависит от
+пользователя, в неё попадают метки {% hole %}. После чтения из кеша
+метки заменяются фрагментами, отрисованными для текущего запроса.
+"""
+import base64
+import hashlib
+import json
+import re
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+VERSION_KEY = 'page_cache.version'
+HOLE_PATTERN = re.compile(r'<!--hole:([A-Za-z0-9_=-]+)-->')
+
+_holes = {}
+
+
+def register_hole(name, template_name):
+    """Регистрирует функцию, готовящую контекст фрагмента"""
+    def decorator(function):
+        _holes[name] = (template_name, function)
+        return function
+    return decorator
+
+
+def render_hole(request, name, params):
+    template_name, function = _holes[name]
+    return render_to_string(
+        template_name, function(request, **params), request=request
+    )
+
+
+def placeholder(name, params):
+    payload = json.dumps([name, params], separators=(',', ':'))
+    encoded = base64.urlsafe_b64encode(payload.encode()).decode()
+    return mark_safe(f'<!--hole:{encoded}-->')
+
+
+def fill_holes(request, content):
+    def replace(match):
+        name, params = json.loads(base64.urlsafe_b64decode(match.group(1)))
+        return render_hole(request, name, params)
+    return HOLE_PATTERN.sub(replace, content)
+
+
+def content_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_content_version(**kwargs):
+    """Делает недействительными все сохранённые страницы"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page_cache.{content_version()}.{path}'
+
+
+def cache_page_with_holes(timeout):
+    """Кеширует страницу целиком, дорисовывая персональные фрагменты"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key = page_key(request)
+            cached = cache.get(key)
+            if cached is not None:
+                content_type, body = cached
+                return HttpResponse(
+                    fill_holes(request, body), content_type=content_type
+                )
+            request.page_cache_holes = True
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                request.page_cache_holes = False
+            if response.streaming:
+                return response
+            body = response.content.decode(response.charset)
+            if response.status_code == 200:
+                cache.set(key, (response['Content-Type'], body), timeout)
+            response.content = fill_holes(request, body)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,36 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+def connect(path, timeout=5):
+    """Соединение с файлом SQLite, общее для потока"""
+    connections = getattr(_local, 'connections', None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+    connection = connections.get(path)
+    if connection is None:
+        connection = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None,
+            check_same_thread=False
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connections[path] = connection
+    return connection
+
+
+@contextmanager
+def transaction(connection):
+    """Явная транзакция с блокировкой на запись"""
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield connection
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.utils import timezone
+
+from core import mail
+from tasks.queue import task
+
+
+@task(priority=10)
+def send_queued_emails():
+    """Отправляет накопившиеся письма и планирует повтор неудачных"""
+    mail.send_pending()
+    retry_at = mail.next_retry()
+    # В режиме eager отложенный запуск выполнился бы сразу и по кругу.
+    # Свой ключ: иначе новые письма ждали бы этого повтора в очереди.
+    if retry_at is not None and not settings.TASKS_EAGER:
+        send_queued_emails.delay(
+            dedup_key='mail.retry',
+            countdown=max((retry_at - timezone.now()).total_seconds(), 0)
+        )
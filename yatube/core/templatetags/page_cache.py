@@ -0,0 +1,15 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.page_cache import placeholder, render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **params):
+    """Персональный фрагмент: метка в кешируемой странице или сам фрагмент"""
+    request = context.get('request')
+    if getattr(request, 'page_cache_holes', False):
+        return placeholder(name, params)
+    return mark_safe(render_hole(request, name, params))
@@ -0,0 +1,63 @@
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template import Library, TemplateSyntaxError, VariableDoesNotExist
+from django.templatetags.cache import CacheNode, do_cache
+
+from core.cache import get_or_recompute
+
+register = Library()
+
+
+class StaleWhileRevalidateNode(CacheNode):
+    """{% cache %}, перестраивающий фрагмент одним запросом"""
+
+    def resolve(self, variable, context):
+        try:
+            return variable.resolve(context)
+        except VariableDoesNotExist:
+            raise TemplateSyntaxError(
+                f'"cache" tag got an unknown variable: {variable.var!r}'
+            )
+
+    def get_cache(self, context):
+        if self.cache_name:
+            name = self.resolve(self.cache_name, context)
+            try:
+                return caches[name]
+            except InvalidCacheBackendError:
+                raise TemplateSyntaxError(
+                    f'Invalid cache name specified for cache tag: {name!r}'
+                )
+        try:
+            return caches['template_fragments']
+        except InvalidCacheBackendError:
+            return caches['default']
+
+    def render(self, context):
+        expire_time = self.resolve(self.expire_time_var, context)
+        try:
+            expire_time = int(expire_time)
+        except (ValueError, TypeError):
+            raise TemplateSyntaxError(
+                f'"cache" tag got a non-integer timeout value: {expire_time!r}'
+            )
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = 'swr.' + make_template_fragment_key(self.fragment_name, vary_on)
+        return get_or_recompute(
+            key, lambda: self.nodelist.render(context), expire_time,
+            cache=self.get_cache(context)
+        )
+
+
+@register.tag('cache')
+def do_swr_cache(parser, token):
+    """
+    Замена {% cache %} с защитой от лавины перестроений.
+
+    Использование такое же: {% load swr_cache %}{% cache 20 name var %}
+    """
+    node = do_cache(parser, token)
+    return StaleWhileRevalidateNode(
+        node.nodelist, node.expire_time_var, node.fragment_name,
+        node.vary_on, node.cache_name
+    )
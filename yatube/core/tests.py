@@ -1,6 +1,36 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
-from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import ResolverMatch, reverse
+
+from core import metrics, warmup
+from core.cache import TwoTierCache, _tiers, get_or_recompute
+from core.fields import RAW, ZLIB
+from core.mail import send_pending
+from core.models import OutgoingEmail
+from core.page_cache import page_key
+from posts.models import ArchivedPost
+from tasks.models import Job
+from tasks.queue import Worker
+
+User = get_user_model()
+TEMP_DIR = tempfile.mkdtemp()
 
 
 class ViewTestClass(TestCase):
@@ -12,3 +42,444 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(METRICS_DB=os.path.join(TEMP_DIR, 'metrics.sqlite3'))
+class MetricsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        metrics.REGISTRY.reset()
+
+    def test_metrics_collects_requests(self):
+        """Метрики учитывают запросы к представлениям"""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        content = response.content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 1.0',
+            content
+        )
+        self.assertIn('yatube_responses_total{status="200"}', content)
+        self.assertIn('yatube_db_queries_per_request_bucket', content)
+
+    def test_metrics_only_for_internal_callers(self):
+        """Метрики недоступны внешним адресам"""
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='203.0.113.7'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token_replaces_address_check(self):
+        """С токеном локальный адрес без заголовка не пускается"""
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code,
+                         HTTPStatus.FORBIDDEN)
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION='Bearer secret',
+            REMOTE_ADDR='203.0.113.7'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_failed_flush_keeps_increments(self):
+        """Занятое хранилище не роняет запрос и не теряет метрики"""
+        locked = sqlite3.OperationalError('database is locked')
+        with mock.patch.object(metrics.REGISTRY, '_connect',
+                               side_effect=locked), \
+                self.settings(METRICS_FLUSH_INTERVAL=0), \
+                self.assertLogs('yatube.metrics', 'WARNING'):
+            response = self.client.get(reverse('about:author'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        content = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="about:author"} 1.0',
+            content
+        )
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_slow_queries_logged_with_plan(self):
+        """Медленные запросы попадают в журнал вместе с планом"""
+        with self.assertLogs('yatube.slow_queries') as logs:
+            Client().get(reverse('posts:index'))
+        records = [json.loads(line.split(':', 2)[2]) for line in logs.output]
+        selects = [r for r in records if r['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+        self.assertEqual(selects[0]['view'], 'posts:index')
+        self.assertTrue(selects[0]['plan'])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_explain_not_counted_in_request_metrics(self):
+        """EXPLAIN для журнала не попадает в метрики запросов к БД"""
+        with CaptureQueriesContext(connection) as captured, \
+                mock.patch.object(metrics.DB_QUERIES, 'observe') as observe, \
+                self.assertLogs('yatube.slow_queries'):
+            Client().get(reverse('posts:index'))
+        executed = [query for query in captured
+                    if not query['sql'].startswith('EXPLAIN')]
+        self.assertLess(len(executed), len(captured))
+        observe.assert_called_once_with(len(executed), view='posts:index')
+
+    def test_slowqueries_command_summarizes_log(self):
+        """Команда slowqueries группирует запросы по общему времени"""
+        path = os.path.join(TEMP_DIR, 'slow.log')
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as log:
+            for time_ms, sql in ((5, 'SELECT 1'), (7, 'SELECT 1'),
+                                 (20, 'SELECT 2')):
+                log.write(json.dumps({
+                    'time_ms': time_ms, 'view': 'posts:profile', 'sql': sql
+                }) + '\n')
+        out = StringIO()
+        call_command('slowqueries', log=path, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('20.0 ms'))
+        self.assertTrue(lines[2].startswith('12.0 ms всего, 2 раз'))
+
+
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(
+            username='staff', is_staff=True, is_superuser=True
+        )
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        cache.clear()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_cprofile_for_staff(self):
+        """Сотрудник получает статистику cProfile вместо страницы"""
+        response = self.staff_client.get(
+            reverse('posts:index'), {'_profile': 'cprofile'}
+        )
+        self.assertEqual(response['Content-Type'],
+                         'text/plain; charset=utf-8')
+        self.assertIn('Представление: posts:index', response.content.decode())
+        self.assertIn('function calls', response.content.decode())
+
+    def test_unknown_sort_falls_back_to_cumulative(self):
+        """Неизвестный _sort не роняет профилирование"""
+        response = self.staff_client.get(
+            reverse('posts:index'), {'_profile': 'cprofile', '_sort': 'bogus'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('cumulative time', response.content.decode())
+
+    def test_tracemalloc_for_admin_changelist(self):
+        """Профилирование памяти работает и для списков в админке"""
+        response = self.staff_client.get(
+            '/admin/posts/post/', {'_profile': 'tracemalloc'}
+        )
+        self.assertIn('Статус ответа: 200', response.content.decode())
+
+    def test_profile_ignored_for_regular_users(self):
+        """Обычный пользователь получает обычную страницу"""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(
+            reverse('posts:index'), {'_profile': 'cprofile'}
+        )
+        self.assertTemplateUsed(response, 'posts/index.html')
+
+
+class WarmupTests(TestCase):
+    def test_warmup_reports_every_phase(self):
+        """Команда warmup выполняет и замеряет все фазы прогрева"""
+        out = StringIO()
+        call_command('warmup', stdout=out)
+        output = out.getvalue()
+        for phase in ('templates', 'urls', 'backends', 'caches', 'всего'):
+            with self.subTest(phase=phase):
+                self.assertIn(phase, output)
+
+    def test_failed_phase_does_not_stop_warmup(self):
+        """Ошибка фазы логируется, остальные фазы выполняются"""
+        def broken():
+            raise RuntimeError('база заблокирована')
+
+        phases = (('broken', broken),) + warmup.PHASES[1:]
+        with mock.patch.object(warmup, 'PHASES', phases), \
+                self.assertLogs('yatube.warmup', 'ERROR'):
+            report = warmup.run()
+        self.assertIn('база заблокирована', report[0][2])
+        self.assertEqual(len(report), len(warmup.PHASES))
+
+    def test_failed_prime_is_reported(self):
+        """Неуспешный ответ при прогреве попадает в отчёт"""
+        match = ResolverMatch(lambda request: HttpResponse(status=500),
+                              (), {})
+        with mock.patch.object(warmup, 'resolve', return_value=match), \
+                self.assertLogs('yatube.warmup', 'WARNING'):
+            detail = warmup.prime_feed_caches()
+        self.assertIn('ошибки', detail)
+        self.assertIn('500', detail)
+
+    @override_settings(ALLOWED_HOSTS=['yatube.example'],
+                       SITE_URL='https://yatube.example')
+    def test_prime_fills_cache_without_metrics(self):
+        """Прогрев работает с настоящим хостом и не считается трафиком"""
+        cache.clear()
+        with mock.patch.object(metrics.RESPONSES, 'inc') as responses:
+            detail = warmup.prime_feed_caches()
+        self.assertNotIn('ошибки', detail)
+        responses.assert_not_called()
+        request = RequestFactory().get(reverse('posts:index'))
+        self.assertIsNotNone(cache.get(page_key(request)))
+
+
+class TwoTierCacheTests(TestCase):
+    def make_worker(self):
+        """Отдельный экземпляр с собственным L1, как в другом процессе"""
+        _tiers.clear()
+        return TwoTierCache(self.location, {
+            'OPTIONS': {'SYNC_INTERVAL': 0, 'L1_MAX_ENTRIES': 2},
+        })
+
+    def setUp(self):
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        self.location = os.path.join(TEMP_DIR, 'cache.sqlite3')
+        self.first = self.make_worker()
+        self.second = self.make_worker()
+        self.first.clear()
+
+    def test_value_shared_between_workers(self):
+        """Значение, записанное одним воркером, видно другому через L2"""
+        self.first.set('key', {'value': 1})
+        self.assertEqual(self.second.get('key'), {'value': 1})
+
+    def test_invalidation_reaches_other_workers(self):
+        """Перезапись и удаление сбрасывают L1 других воркеров"""
+        self.first.set('key', 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+        self.first.set('key', 'value')
+        self.second.get('key')
+        self.first.clear()
+        self.assertIsNone(self.second.get('key'))
+
+    def test_add_incr_and_expiry(self):
+        """add не перезаписывает живые ключи, incr и таймауты работают"""
+        self.assertTrue(self.first.add('counter', 1))
+        self.assertFalse(self.second.add('counter', 5))
+        self.assertEqual(self.second.incr('counter'), 2)
+        self.assertEqual(self.first.get('counter'), 2)
+        self.first.set('short', 'value', timeout=-1)
+        self.assertIsNone(self.second.get('short'))
+        self.assertTrue(self.second.add('short', 'again'))
+
+    def test_l1_is_bounded(self):
+        """L1 хранит не больше L1_MAX_ENTRIES ключей"""
+        for number in range(5):
+            self.first.set(f'key-{number}', number)
+        self.assertEqual(len(self.first._l1), 2)
+        self.assertEqual(self.first.get('key-0'), 0)
+
+
+class StampedeProtectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_fresh_value_is_not_recomputed(self):
+        """Свежее значение берётся из кеша"""
+        self.assertEqual(get_or_recompute('key', self.compute, 60), 1)
+        self.assertEqual(get_or_recompute('key', self.compute, 60), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_served_while_locked(self):
+        """Пока другой запрос перестраивает запись, отдаётся старая"""
+        get_or_recompute('key', self.compute, -1)
+        cache.add('key.lock', True)
+        self.assertEqual(get_or_recompute('key', self.compute, 60), 1)
+        self.assertEqual(self.calls, 1)
+        cache.delete('key.lock')
+        self.assertEqual(get_or_recompute('key', self.compute, 60), 2)
+
+    def test_template_tag_is_drop_in_replacement(self):
+        """{% cache %} из swr_cache кеширует фрагмент как стандартный"""
+        template = Template(
+            '{% load swr_cache %}{% cache 20 fragment name %}'
+            '{{ value }}{% endcache %}'
+        )
+        first = template.render(Context({'name': 'a', 'value': 'first'}))
+        second = template.render(Context({'name': 'a', 'value': 'second'}))
+        self.assertEqual(first, 'first')
+        self.assertEqual(second, 'first')
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+    fail = False
+
+    def open(self):
+        CountingBackend.opened += 1
+
+    def send_messages(self, messages):
+        if CountingBackend.fail:
+            raise ConnectionError('SMTP недоступен')
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+    EMAIL_DELIVERY_BACKEND='core.tests.CountingBackend',
+)
+class QueuedEmailTests(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+        CountingBackend.fail = False
+
+    def test_password_reset_is_queued(self):
+        """Сброс пароля не ждёт отправки письма"""
+        User.objects.create_user(
+            username='reader', email='reader@ya.ru', password='secret-123'
+        )
+        self.client.post(reverse('users:password_reset_form'),
+                         {'email': 'reader@ya.ru'})
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutgoingEmail.objects.get().recipients,
+                         'reader@ya.ru')
+        self.assertTrue(Job.objects.filter(dedup_key='mail.send').exists())
+        Worker().run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reader@ya.ru'])
+        self.assertEqual(OutgoingEmail.objects.get().status,
+                         OutgoingEmail.SENT)
+
+    def test_batches_share_one_connection(self):
+        """Все пачки уходят через одно соединение"""
+        with self.settings(EMAIL_BATCH_SIZE=2):
+            for number in range(5):
+                mail.send_mail('Тема', 'Текст', 'from@ya.ru',
+                               [f'user{number}@ya.ru'])
+            self.assertEqual(Job.objects.count(), 1)
+            self.assertEqual(send_pending(), 5)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_failed_delivery_is_retried(self):
+        """Ошибка отправки откладывает письмо, а потом помечает его"""
+        CountingBackend.fail = True
+        mail.send_mail('Тема', 'Текст', 'from@ya.ru', ['user@ya.ru'])
+        with self.assertLogs('yatube.mail', 'WARNING'):
+            send_pending()
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.status, email.attempts),
+                         (OutgoingEmail.QUEUED, 1))
+        self.assertEqual(send_pending(), 0)
+        with self.settings(EMAIL_MAX_ATTEMPTS=2):
+            OutgoingEmail.objects.update(next_attempt=email.created)
+            with self.assertLogs('yatube.mail', 'WARNING'):
+                send_pending()
+        self.assertEqual(OutgoingEmail.objects.get().status,
+                         OutgoingEmail.FAILED)
+
+    def test_new_mail_does_not_wait_for_retry(self):
+        """Отложенный повтор не задерживает новые письма"""
+        CountingBackend.fail = True
+        mail.send_mail('Тема', 'Текст', 'from@ya.ru', ['user@ya.ru'])
+        with self.assertLogs('yatube.mail', 'WARNING'):
+            Worker().run_pending()
+        self.assertTrue(Job.objects.filter(
+            dedup_key='mail.retry', status=Job.QUEUED
+        ).exists())
+        CountingBackend.fail = False
+        mail.send_mail('reset', 'Текст', 'from@ya.ru', ['reader@ya.ru'])
+        self.assertEqual(Worker().run_pending(), 1)
+        self.assertEqual(
+            OutgoingEmail.objects.get(subject='reset').status,
+            OutgoingEmail.SENT
+        )
+
+    def test_delivery_metrics_reach_shared_store(self):
+        """Результаты отправки из воркера видны в общем хранилище"""
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'metrics.sqlite3')
+        with self.settings(METRICS_DB=path, EMAIL_BATCH_SIZE=2):
+            metrics.REGISTRY.reset()
+            for number in range(3):
+                mail.send_mail('Тема', 'Текст', 'from@ya.ru',
+                               [f'user{number}@ya.ru'])
+            call_command('runworker', once=True, stdout=StringIO())
+            with sqlite3.connect(path) as connection:
+                samples = dict(connection.execute(
+                    'SELECT name || labels, value FROM metric_samples'
+                ).fetchall())
+        shutil.rmtree(directory, ignore_errors=True)
+        self.assertEqual(samples['yatube_emails_totalresult="sent"'], 3)
+        self.assertEqual(
+            samples['yatube_email_batch_duration_seconds_count'], 2
+        )
+
+
+class CompressedTextFieldTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+
+    def create(self, text):
+        return ArchivedPost.objects.create(
+            id=ArchivedPost.objects.count() + 1, author=self.author,
+            text=text, pub_date='2020-01-01 00:00'
+        )
+
+    def stored(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT text FROM posts_archivedpost WHERE id = %s',
+                [post.id]
+            )
+            return bytes(cursor.fetchone()[0])
+
+    @override_settings(COMPRESSED_TEXT_THRESHOLD=100)
+    def test_long_text_is_compressed_and_read_lazily(self):
+        """Длинный текст сжимается и распаковывается при обращении"""
+        long_post = self.create('Длинный текст. ' * 100)
+        short_post = self.create('Коротко')
+        self.assertEqual(self.stored(long_post)[:1], ZLIB)
+        self.assertLess(len(self.stored(long_post)), 200)
+        self.assertEqual(self.stored(short_post)[:1], RAW)
+        loaded = ArchivedPost.objects.get(pk=long_post.pk)
+        self.assertIsInstance(loaded.__dict__['text'], bytes)
+        self.assertEqual(loaded.text, 'Длинный текст. ' * 100)
+        self.assertEqual(ArchivedPost.objects.get(pk=short_post.pk).text,
+                         'Коротко')
+
+    @override_settings(COMPRESSED_TEXT_THRESHOLD=100)
+    def test_command_converts_plain_rows(self):
+        """Команда сжимает строки, сохранённые обычным текстом"""
+        post = self.create('')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE posts_archivedpost SET text = %s WHERE id = %s',
+                ['Старый формат. ' * 100, post.id]
+            )
+        self.assertEqual(ArchivedPost.objects.get(pk=post.pk).text,
+                         'Старый формат. ' * 100)
+        out = StringIO()
+        call_command('compress_text', batch_size=1, stdout=out)
+        self.assertIn('posts.ArchivedPost.text: изменено строк 1',
+                      out.getvalue())
+        self.assertEqual(self.stored(post)[:1], ZLIB)
+        self.assertEqual(ArchivedPost.objects.get(pk=post.pk).text,
+                         'Старый формат. ' * 100)
@@ -0,0 +1,28 @@
+from sorl.thumbnail.engines import pil_engine
+from sorl.thumbnail.kvstores import cached_db_kvstore
+
+from core import metrics
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """Хранилище sorl-thumbnail со счётчиками попаданий"""
+
+    def _get(self, key, identity='image'):
+        value = super()._get(key, identity)
+        metrics.CACHE_REQUESTS.inc(
+            cache='thumbnail_kv',
+            result='miss' if value is None else 'hit'
+        )
+        return value
+
+
+class Engine(pil_engine.Engine):
+    """PIL-движок sorl-thumbnail с замером времени обработки"""
+
+    def create(self, image, geometry, options):
+        with metrics.IMAGE_PROCESSING_LATENCY.time(operation='create'):
+            return super().create(image, geometry, options)
+
+    def write(self, image, options, thumbnail):
+        with metrics.IMAGE_PROCESSING_LATENCY.time(operation='write'):
+            return super().write(image, options, thumbnail)
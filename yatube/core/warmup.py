@@ -0,0 +1,141 @@
+"""Прогрев воркера: шаблоны, адреса, ленивые модули и кеши лент"""
+import importlib
+import logging
+import os
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Count
+from django.template import TemplateSyntaxError
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.urls import (
+    URLPattern, URLResolver, get_resolver, resolve, reverse
+)
+
+logger = logging.getLogger('yatube.warmup')
+
+LAZY_MODULES = (
+    'PIL.Image',
+    'PIL.JpegImagePlugin',
+    'PIL.PngImagePlugin',
+    'PIL.GifImagePlugin',
+    'sorl.thumbnail.base',
+    'sorl.thumbnail.engines.pil_engine',
+)
+
+
+def compile_templates():
+    count = failed = 0
+    for root, _, files in os.walk(settings.TEMPLATES_DIR):
+        for name in files:
+            if not name.endswith('.html'):
+                continue
+            template = os.path.relpath(
+                os.path.join(root, name), settings.TEMPLATES_DIR
+            )
+            try:
+                get_template(template)
+                count += 1
+            except TemplateSyntaxError as error:
+                failed += 1
+                logger.warning('warmup: %s не компилируется: %s',
+                               template, error)
+    return f'{count} шаблонов, ошибок: {failed}'
+
+
+def named_patterns(patterns, namespace=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = namespace
+            if pattern.namespace:
+                prefix = f'{namespace}{pattern.namespace}:'
+            yield from named_patterns(pattern.url_patterns, prefix)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield f'{namespace}{pattern.name}', pattern
+
+
+def resolve_urls():
+    count = 0
+    for name, pattern in named_patterns(get_resolver().url_patterns):
+        if not pattern.pattern.converters and '(?P<' not in str(
+                pattern.pattern):
+            reverse(name)
+            count += 1
+    return f'{count} адресов'
+
+
+def import_backends():
+    for module in LAZY_MODULES:
+        importlib.import_module(module)
+    from PIL import Image
+    from sorl.thumbnail import default
+    Image.init()
+    default.backend, default.engine, default.kvstore
+    return f'{len(LAZY_MODULES)} модулей'
+
+
+def get_page(factory, url, secure):
+    """
+    Вызывает представление напрямую, минуя middleware.
+
+    Так прогрев не попадает в метрики как настоящие запросы.
+    """
+    request = factory.get(url, secure=secure)
+    request.user = AnonymousUser()
+    request.resolver_match = match = resolve(request.path_info)
+    return match.func(request, *match.args, **match.kwargs)
+
+
+def prime_feed_caches():
+    from posts.models import Group
+    site = urlsplit(settings.SITE_URL)
+    factory = RequestFactory(HTTP_HOST=site.netloc)
+    secure = site.scheme == 'https'
+    urls = [reverse('posts:index')]
+    groups = Group.objects.annotate(
+        posts_count=Count('posts')
+    ).order_by('-posts_count')[:settings.WARMUP_GROUPS]
+    urls += [reverse('posts:group_list', args=(group.slug,))
+             for group in groups]
+    failed = []
+    for url in urls:
+        status = get_page(factory, url, secure).status_code
+        if status != 200:
+            failed.append(f'{url} {status}')
+            logger.warning('warmup: %s ответил %s', url, status)
+    detail = f'{len(urls)} страниц'
+    if failed:
+        detail += f', ошибки: {", ".join(failed)}'
+    return detail
+
+
+PHASES = (
+    ('templates', compile_templates),
+    ('urls', resolve_urls),
+    ('backends', import_backends),
+    ('caches', prime_feed_caches),
+)
+
+
+def run():
+    """
+    Выполняет все фазы и возвращает их длительность.
+
+    Ошибка фазы только логируется: прогрев не должен мешать
+    загрузке WSGI-приложения.
+    """
+    report = []
+    for phase, function in PHASES:
+        start = time.perf_counter()
+        try:
+            detail = function()
+        except Exception as error:
+            logger.exception('warmup %s: ошибка', phase)
+            detail = f'ошибка: {error!r}'
+        duration = time.perf_counter() - start
+        logger.info('warmup %s: %.3f s (%s)', phase, duration, detail)
+        report.append((phase, duration, detail))
+    return report
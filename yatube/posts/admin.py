@@ -1,6 +1,26 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
+from django.utils.html import format_html, format_html_join
 
-from .models import Post, Group, Comment, Follow
+from . import revisions
+from .deletion import request_group_deletion, request_user_deletion
+from .models import (
+    Post, Group, Comment, DeletionRequest, Follow, PostRevision, User
+)
+
+DIFF_TAGS = {'equal': 'span', 'insert': 'ins', 'delete': 'del'}
+
+
+def delete_in_background(request_deletion):
+    def action(modeladmin, request, queryset):
+        for obj in queryset:
+            request_deletion(obj)
+        modeladmin.message_user(
+            request, f'Поставлено в очередь на удаление: {len(queryset)}'
+        )
+    action.short_description = 'Удалить в фоне'
+    action.__name__ = 'delete_in_background'
+    return action
 
 
 @admin.register(Post)
@@ -24,6 +44,7 @@ class GroupAdmin(admin.ModelAdmin):
     search_fields = ('title',)
     list_filter = ('title',)
     empty_value_display = '-пусто-'
+    actions = (delete_in_background(request_group_deletion),)
 
 
 @admin.register(Comment)
@@ -35,3 +56,57 @@ class CommentAdmin(admin.ModelAdmin):
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
+
+
+@admin.register(DeletionRequest)
+class DeletionRequestAdmin(admin.ModelAdmin):
+    list_display = ('label', 'kind', 'status', 'progress', 'created',
+                    'finished')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('kind', 'object_id', 'label', 'status', 'total',
+                       'processed', 'created', 'finished')
+
+    def progress(self, obj):
+        if obj.status == DeletionRequest.DONE:
+            return '100%'
+        if not obj.total:
+            return '—'
+        percent = min(obj.processed * 100 // obj.total, 99)
+        return f'{obj.processed} из {obj.total} ({percent}%)'
+    progress.short_description = 'Прогресс'
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(PostRevision)
+class PostRevisionAdmin(admin.ModelAdmin):
+    list_display = ('post_id', 'number', 'is_snapshot', 'created')
+    list_filter = ('is_snapshot',)
+    search_fields = ('=post__id',)
+    fields = ('post_id', 'number', 'is_snapshot', 'created', 'diff')
+    readonly_fields = fields
+
+    def diff(self, obj):
+        text = revisions.text_at(obj.post_id, obj.number)
+        previous = (revisions.text_at(obj.post_id, obj.number - 1)
+                    if obj.number > 1 else '')
+        return format_html(
+            '<div style="white-space: pre-wrap">{}</div>',
+            format_html_join('', '<{0}>{1}</{0}>', (
+                (DIFF_TAGS[tag], part)
+                for tag, part in revisions.compare(previous, text)
+            ))
+        )
+    diff.short_description = 'Правка относительно предыдущей версии'
+
+    def has_add_permission(self, request):
+        return False
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class BackgroundDeletionUserAdmin(UserAdmin):
+    actions = (delete_in_background(request_user_deletion),)
@@ -0,0 +1,140 @@
+"""
+Архив старых записей.
+
+Записи старше ARCHIVE_AFTER_DAYS вместе с комментариями переносятся
+в ArchivedPost и ArchivedComment с прежними id, поэтому в горячей
+таблице и её индексах остаются только свежие строки. Страницы записи
+и профиля читают архив, когда записи нет в горячей таблице. История
+правок и уведомления ссылаются на запись по id и остаются на месте.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.page_cache import bump_content_version
+from . import signals
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+
+
+class ChainedPosts:
+    """
+    Свежие записи автора, а за ними архивные, как одна последовательность.
+
+    Архивные записи всегда старше горячих, поэтому порядок по дате
+    сохраняется, а срез затрагивает архив только на дальних страницах.
+    """
+
+    def __init__(self, hot, archived):
+        self.hot = hot
+        self.archived = archived
+        self._hot_count = None
+
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.hot.count()
+        return self._hot_count
+
+    def count(self):
+        return self.hot_count() + self.archived.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        hot_count = self.hot_count()
+        items = []
+        if start < hot_count:
+            items += list(self.hot[start:min(stop, hot_count)])
+        if stop > hot_count:
+            items += list(
+                self.archived[max(start - hot_count, 0):stop - hot_count]
+            )
+        return items
+
+
+def author_posts(author):
+    return ChainedPosts(
+        author.posts.defer(*Post.LIST_DEFERRED),
+        author.archived_posts.defer(*Post.LIST_DEFERRED)
+    )
+
+
+def find_post(post_id):
+    """Запись из горячей таблицы или из архива; None, если нет нигде"""
+    for model in (Post, ArchivedPost):
+        post = model.objects.select_related('author').filter(
+            pk=post_id, author__is_active=True
+        ).first()
+        if post is not None:
+            return post
+    return None
+
+
+def attach_archived(items):
+    """
+    Подставляет архивные записи объектам, выбранным с select_related.
+
+    Запрос к архиву делается, только если чьей-то записи нет в горячей
+    таблице; объекты, чьей записи нет и в архиве, выбрасываются.
+    """
+    missing = {item.post_id for item in items if item.post is None}
+    found = {}
+    if missing:
+        found = ArchivedPost.objects.select_related('author').in_bulk(missing)
+    attached = []
+    for item in items:
+        if item.post is None:
+            post = found.get(item.post_id)
+            if post is None:
+                continue
+            type(item).post.field.set_cached_value(item, post)
+        attached.append(item)
+    return attached
+
+
+def archive_batch(cutoff, size):
+    ids = list(
+        Post.objects.filter(pub_date__lt=cutoff).order_by('pub_date')
+        .values_list('id', flat=True)[:size]
+    )
+    if not ids:
+        return 0
+    posts = Post.objects.filter(id__in=ids)
+    comments = Comment.objects.filter(post_id__in=ids)
+    with transaction.atomic(), signals.muted():
+        ArchivedPost.objects.bulk_create([
+            ArchivedPost(id=post.id, text=post.text, pub_date=post.pub_date,
+                         author_id=post.author_id, group_id=post.group_id,
+                         image=post.image.name,
+                         excerpt_html=post.excerpt_html,
+                         text_html=post.text_html)
+            for post in posts
+        ])
+        ArchivedComment.objects.bulk_create([
+            ArchivedComment(id=comment.id, post_id=comment.post_id,
+                            author_id=comment.author_id, text=comment.text,
+                            created=comment.created)
+            for comment in comments.iterator()
+        ], batch_size=size)
+        posts.delete()
+    return len(ids)
+
+
+def archive(days=None):
+    """Переносит в архив записи старше days дней; возвращает их число"""
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    total = 0
+    while True:
+        moved = archive_batch(cutoff, settings.ARCHIVE_BATCH_SIZE)
+        if not moved:
+            break
+        total += moved
+    if total:
+        bump_content_version()
+    return total
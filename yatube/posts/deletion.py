@@ -0,0 +1,165 @@
+"""
+Фоновое удаление пользователей и сообществ.
+
+Запрос на удаление сразу скрывает объект: пользователь становится
+неактивным, сообщество пропадает из реестра. Затем задача удаляет
+зависимые строки порциями по DELETION_BATCH_SIZE, каждая в своей
+короткой транзакции, и только в конце удаляет сам объект, когда
+каскадировать уже нечего.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.page_cache import bump_content_version
+from . import signals
+from .models import (
+    ArchivedComment, ArchivedPost, Comment, DeletionRequest, EngagementBucket,
+    Follow, Group, Notification, Post, PostRevision, Recommendation, User
+)
+from .registry import groups
+
+DELETE = 'delete'
+DETACH = 'detach'
+
+
+def user_steps(user_id):
+    archived_ids = ArchivedPost.objects.filter(
+        author_id=user_id
+    ).values('id')
+    return (
+        (DELETE, Comment.objects.filter(author_id=user_id)),
+        (DELETE, Comment.objects.filter(post__author_id=user_id)),
+        (DELETE, ArchivedComment.objects.filter(author_id=user_id)),
+        (DELETE, ArchivedComment.objects.filter(post__author_id=user_id)),
+        (DELETE, Notification.objects.filter(post_id__in=archived_ids)),
+        (DELETE, PostRevision.objects.filter(post_id__in=archived_ids)),
+        (DELETE, ArchivedPost.objects.filter(author_id=user_id)),
+        (DELETE, Notification.objects.filter(post__author_id=user_id)),
+        (DELETE, Notification.objects.filter(user_id=user_id)),
+        (DELETE, Recommendation.objects.filter(author_id=user_id)),
+        (DELETE, Recommendation.objects.filter(user_id=user_id)),
+        (DELETE, Follow.objects.filter(author_id=user_id)),
+        (DELETE, Follow.objects.filter(user_id=user_id)),
+        (DELETE, PostRevision.objects.filter(post__author_id=user_id)),
+        (DELETE, Post.objects.filter(author_id=user_id)),
+    )
+
+
+def group_steps(group_id):
+    return (
+        (DETACH, Post.objects.filter(group_id=group_id)),
+        (DETACH, ArchivedPost.objects.filter(group_id=group_id)),
+    )
+
+
+def steps(request):
+    if request.kind == DeletionRequest.USER:
+        return user_steps(request.object_id)
+    return group_steps(request.object_id)
+
+
+def hidden_group_ids():
+    return set(
+        DeletionRequest.objects.filter(kind=DeletionRequest.GROUP)
+        .exclude(status=DeletionRequest.DONE)
+        .values_list('object_id', flat=True)
+    )
+
+
+def _open_request(kind, object_id, label):
+    request = (
+        DeletionRequest.objects.filter(kind=kind, object_id=object_id)
+        .exclude(status=DeletionRequest.DONE).first()
+    )
+    if request is None:
+        request = DeletionRequest.objects.create(
+            kind=kind, object_id=object_id, label=label
+        )
+    return request
+
+
+def _schedule(request):
+    from .tasks import process_deletion
+    process_deletion.delay(request.pk, dedup_key=f'deletion.{request.pk}')
+
+
+def request_user_deletion(user):
+    """Скрывает пользователя и ставит удаление в очередь"""
+    with transaction.atomic():
+        request = _open_request(DeletionRequest.USER, user.pk, user.username)
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+    _schedule(request)
+    return request
+
+
+def request_group_deletion(group):
+    """Скрывает сообщество и ставит удаление в очередь"""
+    with transaction.atomic():
+        request = _open_request(DeletionRequest.GROUP, group.pk, group.slug)
+    groups.invalidate()
+    bump_content_version()
+    _schedule(request)
+    return request
+
+
+def _apply(action, queryset, size):
+    ids = list(queryset.values_list('pk', flat=True)[:size])
+    if ids:
+        with transaction.atomic(), signals.pages_muted():
+            rows = queryset.model.objects.filter(pk__in=ids)
+            if action == DELETE:
+                rows.delete()
+            else:
+                rows.update(group=None)
+        bump_content_version()
+    return len(ids)
+
+
+def _finish(request):
+    kinds = {DeletionRequest.USER: EngagementBucket.AUTHOR,
+             DeletionRequest.GROUP: EngagementBucket.GROUP}
+    model = User if request.kind == DeletionRequest.USER else Group
+    with transaction.atomic():
+        model.objects.filter(pk=request.object_id).delete()
+        EngagementBucket.objects.filter(
+            kind=kinds[request.kind], object_id=request.object_id
+        ).delete()
+        request.status = DeletionRequest.DONE
+        request.finished = timezone.now()
+        request.save(update_fields=['status', 'finished'])
+    if request.kind == DeletionRequest.GROUP:
+        groups.invalidate()
+
+
+def process(request_id):
+    """
+    Выполняет не больше DELETION_BATCHES_PER_RUN порций.
+
+    Возвращает True, если удаление завершено; иначе продолжение
+    нужно запустить ещё раз.
+    """
+    request = DeletionRequest.objects.get(pk=request_id)
+    if request.status == DeletionRequest.DONE:
+        return True
+    if request.status == DeletionRequest.PENDING:
+        request.total = sum(
+            queryset.count() for _, queryset in steps(request)
+        )
+        request.status = DeletionRequest.RUNNING
+        request.save(update_fields=['total', 'status'])
+    size = settings.DELETION_BATCH_SIZE
+    for _ in range(settings.DELETION_BATCHES_PER_RUN):
+        for action, queryset in steps(request):
+            done = _apply(action, queryset, size)
+            if done:
+                DeletionRequest.objects.filter(pk=request.pk).update(
+                    processed=F('processed') + done
+                )
+                break
+        else:
+            _finish(request)
+            return True
+    return False
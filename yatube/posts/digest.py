@@ -0,0 +1,55 @@
+from itertools import groupby
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Max
+from django.template.loader import render_to_string
+
+from .archive import attach_archived
+from .models import Notification
+from .recommendations import chunks
+
+DIGEST_SUBJECT = 'Новые записи избранных авторов'
+
+
+def send_digests():
+    """
+    Собирает непрочитанные уведомления в одно письмо на пользователя.
+
+    Пользователи обрабатываются пачками: одна выборка уведомлений,
+    отрисовка всех писем и одна отправка на пачку. Возвращает число
+    отправленных писем.
+    """
+    pending = Notification.objects.filter(is_read=False, in_digest=False)
+    last_id = pending.aggregate(last_id=Max('id'))['last_id']
+    if last_id is None:
+        return 0
+    pending = pending.filter(id__lte=last_id)
+    user_ids = list(
+        pending.order_by('user_id').values_list('user_id', flat=True)
+        .distinct()
+    )
+    connection = get_connection()
+    sent = 0
+    for chunk in chunks(user_ids, settings.DIGEST_BATCH_SIZE):
+        batch = pending.filter(user_id__in=chunk)
+        notifications = attach_archived(list(
+            batch.select_related('user', 'post__author')
+            .order_by('user_id', '-id')
+        ))
+        messages = []
+        for user, items in groupby(notifications, key=attrgetter('user')):
+            if not user.email:
+                continue
+            body = render_to_string('posts/email/digest.txt', {
+                'user': user,
+                'notifications': list(items)[:settings.DIGEST_MAX_POSTS],
+                'site_url': settings.SITE_URL,
+            })
+            messages.append(
+                EmailMessage(DIGEST_SUBJECT, body, to=[user.email])
+            )
+        sent += connection.send_messages(messages) or 0
+        batch.update(in_digest=True)
+    return sent
@@ -0,0 +1,127 @@
+"""
+Потоковая выгрузка записей автора или сообщества в JSONL и CSV.
+
+Записи читаются порциями по EXPORT_BATCH_SIZE по возрастанию id
+(keyset, без OFFSET) из горячей таблицы и архива и сливаются в один
+поток. В памяти одновременно лежит не больше одной порции, поэтому
+объём выгрузки не важен. Курсор — id последней полученной записи:
+передав его в after, клиент продолжит выгрузку с места обрыва.
+"""
+import csv
+import heapq
+import json
+from itertools import islice
+
+from django.conf import settings
+
+from core.fields import decode
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+
+JSONL = 'jsonl'
+CSV = 'csv'
+CONTENT_TYPES = {
+    JSONL: 'application/x-ndjson; charset=utf-8',
+    CSV: 'text/csv; charset=utf-8',
+}
+POST_FIELDS = ('id', 'author__username', 'group__slug', 'pub_date', 'text')
+COMMENT_FIELDS = ('post_id', 'author__username', 'created', 'text')
+CSV_HEADER = ('id', 'author', 'group', 'pub_date', 'text', 'comments')
+
+
+def keyset(queryset, after, size):
+    """Строки queryset по возрастанию id, порциями по size"""
+    while True:
+        batch = (
+            queryset.filter(id__gt=after).order_by('id')
+            .values_list(*POST_FIELDS)[:size]
+        )
+        count = 0
+        for post_id, author, group, pub_date, text in batch.iterator(
+                chunk_size=size):
+            count += 1
+            after = post_id
+            yield {'id': post_id, 'author': author, 'group': group,
+                   'pub_date': pub_date.isoformat(), 'text': decode(text)}
+        if count < size:
+            return
+
+
+def attach_comments(records):
+    ids = [record['id'] for record in records]
+    by_post = {}
+    for model in (Comment, ArchivedComment):
+        rows = (
+            model.objects.filter(post_id__in=ids)
+            .order_by('post_id', 'created', 'id')
+            .values_list(*COMMENT_FIELDS)
+        )
+        for post_id, author, created, text in rows.iterator():
+            by_post.setdefault(post_id, []).append({
+                'author': author, 'created': created.isoformat(),
+                'text': decode(text),
+            })
+    for record in records:
+        record['comments'] = by_post.get(record['id'], [])
+
+
+def records(hot, archived, after=0, comments=False, size=None):
+    """
+    Записи из hot и archived по возрастанию id, начиная после after.
+
+    С comments=True к каждой записи добавляются её комментарии, которые
+    загружаются одним запросом на таблицу для всей порции.
+    """
+    size = size or settings.EXPORT_BATCH_SIZE
+    merged = heapq.merge(
+        keyset(hot.filter(author__is_active=True), after, size),
+        keyset(archived.filter(author__is_active=True), after, size),
+        key=lambda record: record['id'],
+    )
+    while True:
+        batch = list(islice(merged, size))
+        if not batch:
+            return
+        if comments:
+            attach_comments(batch)
+        yield from batch
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу отдаёт строку"""
+
+    def write(self, value):
+        return value
+
+
+def as_jsonl(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def as_csv(records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for record in records:
+        comments = record.get('comments')
+        if comments is not None:
+            comments = json.dumps(comments, ensure_ascii=False)
+        yield writer.writerow((
+            record['id'], record['author'], record['group'] or '',
+            record['pub_date'], record['text'], comments or '',
+        ))
+
+
+RENDERERS = {JSONL: as_jsonl, CSV: as_csv}
+
+
+def render(output_format, records):
+    return RENDERERS[output_format](records)
+
+
+def author_querysets(author):
+    return author.posts.all(), author.archived_posts.all()
+
+
+def group_querysets(group):
+    return (Post.objects.filter(group_id=group.id),
+            ArchivedPost.objects.filter(group_id=group.id))
@@ -0,0 +1,137 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow, User
+from .recommendations import mark_stale
+from .trending import record_follows
+
+FOLLOWING_KEY = 'posts.following.{}'
+
+
+def following_key(user_id):
+    return FOLLOWING_KEY.format(user_id)
+
+
+def following_ids(user):
+    """Множество id авторов, на которых подписан пользователь"""
+    if not user.is_authenticated:
+        return frozenset()
+    ids = getattr(user, '_following_ids', None)
+    if ids is None:
+        ids = cache.get(following_key(user.id))
+    if ids is None:
+        ids = frozenset(
+            Follow.objects.filter(user=user).values_list('author_id',
+                                                         flat=True)
+        )
+        cache.set(following_key(user.id), ids, settings.FOLLOWING_CACHE_TIME)
+    user._following_ids = ids
+    return ids
+
+
+def is_following(user, author_id):
+    return author_id in following_ids(user)
+
+
+def _update(user, added=frozenset(), removed=frozenset()):
+    """
+    Правит множество только в текущем запросе.
+
+    Общий кеш не переписывается: его сбрасывают сигналы Follow, и
+    следующий following_ids() перечитает подписки из БД. Иначе две
+    одновременные подписки затирали бы друг друга.
+    """
+    ids = getattr(user, '_following_ids', None)
+    if ids is not None:
+        user._following_ids = (ids | added) - removed
+
+
+def follow(user, author):
+    """Подписка на автора; False, если она уже была или это сам автор"""
+    if user == author:
+        return False
+    _, created = Follow.objects.get_or_create(user=user, author=author)
+    _update(user, added={author.id})
+    return created
+
+
+def unfollow(user, author):
+    deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+    _update(user, removed={author.id})
+    return bool(deleted)
+
+
+def _resolve(usernames):
+    usernames = list(dict.fromkeys(usernames))
+    authors = dict(
+        User.objects.filter(username__in=usernames, is_active=True)
+        .values_list('username', 'id')
+    )
+    return usernames, authors
+
+
+def follow_many(user, usernames):
+    """
+    Подписка на несколько авторов одной вставкой.
+
+    Возвращает словарь имя -> статус: followed, already_following,
+    self или not_found. Повторный вызов ничего не меняет.
+    """
+    usernames, authors = _resolve(usernames)
+    candidates = {
+        author_id for author_id in authors.values() if author_id != user.id
+    }
+    with transaction.atomic():
+        existing = set(
+            Follow.objects.filter(user=user, author_id__in=candidates)
+            .values_list('author_id', flat=True)
+        )
+        created = Follow.objects.bulk_create(
+            [Follow(user=user, author_id=author_id)
+             for author_id in candidates - existing],
+            ignore_conflicts=True,
+        )
+        if created:
+            mark_stale([user.id])
+            record_follows(candidates - existing)
+    invalidate(user.id)
+    _update(user, added=candidates)
+    results = {}
+    for username in usernames:
+        author_id = authors.get(username)
+        if author_id is None:
+            results[username] = 'not_found'
+        elif author_id == user.id:
+            results[username] = 'self'
+        elif author_id in existing:
+            results[username] = 'already_following'
+        else:
+            results[username] = 'followed'
+    return results
+
+
+def unfollow_many(user, usernames):
+    """Отписка от нескольких авторов одним запросом"""
+    usernames, authors = _resolve(usernames)
+    subscriptions = Follow.objects.filter(
+        user=user, author_id__in=authors.values()
+    )
+    with transaction.atomic():
+        existing = set(subscriptions.values_list('author_id', flat=True))
+        subscriptions.delete()
+    _update(user, removed=existing)
+    results = {}
+    for username in usernames:
+        author_id = authors.get(username)
+        if author_id is None:
+            results[username] = 'not_found'
+        elif author_id in existing:
+            results[username] = 'unfollowed'
+        else:
+            results[username] = 'not_following'
+    return results
+
+
+def invalidate(user_id):
+    cache.delete(following_key(user_id))
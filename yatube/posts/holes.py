@@ -0,0 +1,50 @@
+from django.conf import settings
+
+from core.page_cache import register_hole
+
+from .follows import following_ids, is_following
+from .forms import CommentForm
+from .models import Recommendation
+
+
+@register_hole('switcher', 'posts/includes/switcher.html')
+def switcher(request, **active):
+    return active
+
+
+@register_hole('follow_button', 'posts/includes/follow_button.html')
+def follow_button(request, author_id, username):
+    user = request.user
+    return {
+        'username': username,
+        'is_author': user.is_authenticated and user.id == author_id,
+        'following': is_following(user, author_id),
+    }
+
+
+@register_hole('edit_button', 'posts/includes/edit_button.html')
+def edit_button(request, post_id, author_id):
+    return {
+        'post_id': post_id,
+        'is_author': request.user.id == author_id,
+    }
+
+
+@register_hole('comment_form', 'posts/includes/comment_form.html')
+def comment_form(request, post_id):
+    return {'form': CommentForm(), 'post_id': post_id}
+
+
+@register_hole('recommendations', 'posts/includes/recommendations.html')
+def recommendations(request):
+    user = request.user
+    if not user.is_authenticated:
+        return {}
+    followed = following_ids(user)
+    shown = [
+        recommendation for recommendation in
+        Recommendation.objects.filter(user=user, author__is_active=True)
+        .select_related('author')[:settings.RECOMMENDATIONS_LIMIT]
+        if recommendation.author_id not in followed
+    ]
+    return {'recommendations': shown[:settings.RECOMMENDATIONS_SHOWN]}
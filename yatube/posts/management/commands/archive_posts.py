@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.archive import archive
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые записи с комментариями в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+            help='Архивировать записи старше этого числа дней'
+        )
+
+    def handle(self, *args, **options):
+        moved = archive(options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив записей: {moved}'
+        ))
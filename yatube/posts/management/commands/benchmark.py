@@ -0,0 +1,165 @@
+import json
+import math
+import os
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import urls
+from posts.models import Group, Post, User
+
+# notifications на GET отмечает уведомления прочитанными.
+MUTATING_VIEWS = (
+    'add_comment', 'profile_follow', 'profile_unfollow', 'follow_batch',
+    'notifications',
+)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def sample_arguments(post_id=None):
+    """Значения параметров URL из самых наполненных объектов"""
+    group = Group.objects.annotate(
+        posts_count=Count('posts')).order_by('-posts_count').first()
+    author = User.objects.annotate(
+        posts_count=Count('posts')).order_by('-posts_count').first()
+    if post_id is None:
+        post = Post.objects.order_by('-pub_date').first()
+        post_id = post and post.id
+    return {
+        'slug': group and group.slug,
+        'username': author and author.username,
+        'post_id': post_id,
+    }
+
+
+def benchmark_urls(only=None, post_id=None):
+    """Именованные адреса приложения posts, доступные через GET"""
+    arguments = sample_arguments(post_id)
+    result = {}
+    for pattern in urls.urlpatterns:
+        if pattern.name in MUTATING_VIEWS:
+            continue
+        name = f'{urls.app_name}:{pattern.name}'
+        if only and name not in only:
+            continue
+        kwargs = {key: arguments.get(key)
+                  for key in pattern.pattern.converters}
+        if None in kwargs.values():
+            continue
+        result[name] = reverse(name, kwargs=kwargs)
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержку и число запросов к БД для страниц posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--user', help='Пользователь для запросов')
+        parser.add_argument('--only', nargs='*', help='Имена адресов')
+        parser.add_argument('--post-id', type=int,
+                            help='Запись для post_detail, например архивная')
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кеш перед каждым запросом')
+        parser.add_argument('--baseline', default='benchmark_baseline.json')
+        parser.add_argument('--save-baseline', action='store_true')
+        parser.add_argument('--tolerance', type=float, default=0.2)
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        client = Client()
+        user = self.get_user(options['user'])
+        if user:
+            client.force_login(user)
+        results = {}
+        for name, url in benchmark_urls(
+            options['only'], options['post_id']
+        ).items():
+            results[name] = self.measure(
+                client, url, options['iterations'], options['cold']
+            )
+        baseline = self.load_baseline(options['baseline'])
+        regressions = self.report(results, baseline, options['tolerance'])
+        if options['save_baseline']:
+            with open(options['baseline'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2, ensure_ascii=False)
+            self.stdout.write(
+                f'Базовая линия сохранена: {options["baseline"]}'
+            )
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Регрессии: {", ".join(regressions)}')
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Пользователь {username} не найден')
+        return User.objects.annotate(
+            follows=Count('follower')).order_by('-follows').first()
+
+    def measure(self, client, url, iterations, cold):
+        timings = []
+        queries = []
+        for _ in range(iterations):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    # Выгрузка читает базу, только пока её отдают.
+                    for _ in response.streaming_content:
+                        pass
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(context.captured_queries))
+            if response.status_code >= 400:
+                raise CommandError(f'{url} ответил {response.status_code}')
+        return {
+            'url': url,
+            'p50': round(percentile(timings, 0.50), 3),
+            'p95': round(percentile(timings, 0.95), 3),
+            'p99': round(percentile(timings, 0.99), 3),
+            'queries': max(queries),
+        }
+
+    def load_baseline(self, path):
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def report(self, results, baseline, tolerance):
+        regressions = []
+        self.stdout.write(
+            f'{"адрес":<24} {"p50":>9} {"p95":>9} {"p99":>9} '
+            f'{"запросы":>8}  сравнение'
+        )
+        for name, result in results.items():
+            line = (
+                f'{name:<24} {result["p50"]:>9.2f} {result["p95"]:>9.2f} '
+                f'{result["p99"]:>9.2f} {result["queries"]:>8}'
+            )
+            previous = baseline.get(name)
+            if previous:
+                change = result['p95'] / max(previous['p95'], 1e-9) - 1
+                line += f'  p95 {change:+.0%}'
+                line += (f', запросы {previous["queries"]}'
+                         f'→{result["queries"]}')
+                if (change > tolerance
+                        or result['queries'] > previous['queries']):
+                    regressions.append(name)
+                    line += '  РЕГРЕССИЯ'
+            self.stdout.write(line)
+        return regressions
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = 'Выгружает записи автора или сообщества в JSONL или CSV'
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--author', help='Имя пользователя')
+        target.add_argument('--group', help='Слаг сообщества')
+        parser.add_argument('--format', choices=tuple(export.RENDERERS),
+                            default=export.JSONL)
+        parser.add_argument('--comments', action='store_true',
+                            help='Добавить комментарии к записям')
+        parser.add_argument('--after', type=int, default=0,
+                            help='Продолжить после записи с этим id')
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.EXPORT_BATCH_SIZE)
+        parser.add_argument('--output', help='Файл; по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        records = export.records(
+            *self.querysets(options), after=options['after'],
+            comments=options['comments'], size=options['batch_size']
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as file:
+                self.write(file, options['format'], records)
+        else:
+            self.write(self.stdout, options['format'], records)
+
+    def querysets(self, options):
+        if options['author']:
+            author = User.objects.filter(username=options['author']).first()
+            if author is None:
+                raise CommandError(
+                    f'Пользователь {options["author"]} не найден'
+                )
+            return export.author_querysets(author)
+        group = Group.objects.filter(slug=options['group']).first()
+        if group is None:
+            raise CommandError(f'Сообщество {options["group"]} не найдено')
+        return export.group_querysets(group)
+
+    def write(self, file, output_format, records):
+        for chunk in export.render(output_format, records):
+            if file is self.stdout:
+                file.write(chunk, ending='')
+            else:
+                file.write(chunk)
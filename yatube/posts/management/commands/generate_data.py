@@ -0,0 +1,174 @@
+import random
+from contextlib import contextmanager
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from faker import Faker
+from PIL import Image
+
+from posts import registry, rollups
+from posts.models import Comment, Follow, Group, Post, User, render_text
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Позволяет задать даты, которые обычно ставит auto_now_add"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def power_law_weights(size, exponent):
+    """Накопленные веса закона Ципфа: первые элементы самые популярные"""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу большим объёмом правдоподобных данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--images', type=int, default=100)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--skew', type=float, default=1.1)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = options['days']
+
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            groups = self.create_groups(options['groups'])
+            weights = power_law_weights(len(users), options['skew'])
+            with explicit_dates(Post._meta.get_field('pub_date'),
+                                Comment._meta.get_field('created')):
+                posts = self.create_posts(
+                    options['posts'], users, weights, groups
+                )
+                self.attach_images(posts[:options['images']])
+                self.create_comments(options['comments'], posts, users)
+            self.create_follows(options['follows'], users, weights)
+            rollups.rebuild()
+        registry.groups.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {len(users)} пользователей, {len(groups)} групп, '
+            f'{len(posts)} записей'
+        ))
+
+    def random_date(self):
+        return self.now - timezone.timedelta(
+            seconds=self.random.randrange(self.days * 24 * 60 * 60)
+        )
+
+    def create_users(self, count):
+        password = make_password('password')
+        prefix = User.objects.count()
+        users = [
+            User(
+                username=f'{self.fake.user_name()}_{prefix + number}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                email=self.fake.email(),
+                password=password,
+            )
+            for number in range(count)
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        return list(User.objects.order_by('-id')[:count])
+
+    def create_groups(self, count):
+        prefix = Group.objects.count()
+        groups = []
+        for number in range(count):
+            slug = slugify(self.fake.word()) or 'group'
+            groups.append(Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'{slug}-{prefix + number}',
+                description=self.fake.paragraph(),
+            ))
+        Group.objects.bulk_create(groups, batch_size=self.batch_size)
+        return list(Group.objects.order_by('-id')[:count])
+
+    def create_posts(self, count, users, weights, groups):
+        authors = self.random.choices(users, cum_weights=weights, k=count)
+        posts = [
+            Post(
+                author=author,
+                group=self.random.choice(groups)
+                if groups and self.random.random() < 0.7 else None,
+                text='\n'.join(
+                    self.fake.paragraphs(nb=self.random.randint(1, 5))
+                ),
+                pub_date=self.random_date(),
+            )
+            for author in authors
+        ]
+        for post in posts:
+            post.excerpt_html, post.text_html = render_text(post.text)
+        Post.objects.bulk_create(posts, batch_size=self.batch_size)
+        return list(Post.objects.order_by('-id')[:count])
+
+    def attach_images(self, posts):
+        for post in posts:
+            buffer = BytesIO()
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            Image.new('RGB', (960, 640), color).save(buffer, 'JPEG')
+            post.image = default_storage.save(
+                f'posts/generated_{post.id}.jpg',
+                ContentFile(buffer.getvalue())
+            )
+        Post.objects.bulk_update(posts, ['image'], batch_size=self.batch_size)
+
+    def create_comments(self, count, posts, users):
+        if not posts:
+            return
+        post_weights = power_law_weights(len(posts), 1.0)
+        targets = self.random.choices(posts, cum_weights=post_weights, k=count)
+        comments = [
+            Comment(
+                post=post,
+                author=self.random.choice(users),
+                text=self.fake.sentence(nb_words=self.random.randint(3, 30)),
+                created=max(post.pub_date, self.random_date()),
+            )
+            for post in targets
+        ]
+        Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+
+    def create_follows(self, count, users, weights):
+        edges = set()
+        for _ in range(count * 2):
+            if len(edges) >= count or len(users) < 2:
+                break
+            user = self.random.choice(users)
+            author = self.random.choices(users, cum_weights=weights)[0]
+            if user != author:
+                edges.add((user.id, author.id))
+        Follow.objects.bulk_create(
+            [Follow(user_id=user, author_id=author) for user, author in edges],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает помесячные счётчики записей для архива'
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Счётчиков месяцев: {rows}'))
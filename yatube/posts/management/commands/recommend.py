@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «на кого подписаться»'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Только пользователи с изменившимися подписками'
+        )
+
+    def handle(self, *args, **options):
+        users, rows = recommendations.rebuild(options['incremental'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {users}, рекомендаций: {rows}'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.digest import send_digests
+
+
+class Command(BaseCommand):
+    help = 'Рассылает ежедневный дайджест непрочитанных уведомлений'
+
+    def handle(self, *args, **options):
+        sent = send_digests()
+        self.stdout.write(self.style.SUCCESS(f'Писем в очереди: {sent}'))
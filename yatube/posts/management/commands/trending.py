@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает популярные записи, сообщества и авторов'
+
+    def handle(self, *args, **options):
+        result = trending.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей: {len(result["posts"])}, '
+            f'сообществ: {len(result["groups"])}, '
+            f'авторов: {len(result["authors"])}'
+        ))
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EngagementBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Запись'), ('group', 'Сообщество'), ('author', 'Автор')], max_length=10, verbose_name='Тип объекта')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Id объекта')),
+                ('bucket', models.PositiveIntegerField(db_index=True, verbose_name='Номер интервала')),
+                ('comments', models.PositiveIntegerField(default=0, verbose_name='Комментарии')),
+                ('follows', models.PositiveIntegerField(default=0, verbose_name='Новые подписчики')),
+            ],
+            options={
+                'verbose_name': 'Активность',
+                'verbose_name_plural': 'Активность',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='engagementbucket',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id', 'bucket'), name='unique_engagement_bucket'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:51
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def fill_counts(apps, schema_editor):
+    MonthlyPostCount = apps.get_model('posts', 'MonthlyPostCount')
+    rows = {}
+    for name in ('Post', 'ArchivedPost'):
+        queryset = apps.get_model('posts', name).objects.annotate(
+            year=ExtractYear('pub_date'), month=ExtractMonth('pub_date')
+        ).order_by()
+        for field, scope in ((None, 'site'), ('author_id', 'author'),
+                             ('group_id', 'group')):
+            fields = (field,) if field else ()
+            grouped = queryset.values(*fields, 'year', 'month').annotate(
+                total=Count('id')
+            )
+            for row in grouped:
+                scope_id = row[field] if field else 0
+                if scope_id is None:
+                    continue
+                key = (scope, scope_id, row['year'], row['month'])
+                rows[key] = rows.get(key, 0) + row['total']
+    MonthlyPostCount.objects.bulk_create(
+        [MonthlyPostCount(scope=scope, scope_id=scope_id, year=year,
+                          month=month, count=count)
+         for (scope, scope_id, year, month), count in rows.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyPostCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('site', 'Весь сайт'), ('group', 'Сообщество'), ('author', 'Автор')], max_length=10, verbose_name='Область')),
+                ('scope_id', models.PositiveIntegerField(default=0, verbose_name='Id сообщества или автора')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Год')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='Месяц')),
+                ('count', models.IntegerField(default=0, verbose_name='Записей')),
+            ],
+            options={
+                'verbose_name': 'Записи за месяц',
+                'verbose_name_plural': 'Записи по месяцам',
+                'ordering': ('-year', '-month'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlypostcount',
+            constraint=models.UniqueConstraint(fields=('scope', 'scope_id', 'year', 'month'), name='unique_monthly_post_count'),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:54
+
+from django.db import migrations, models
+from django.template.defaultfilters import linebreaksbr, truncatewords
+
+
+def render(apps, schema_editor):
+    for name in ('Post', 'ArchivedPost'):
+        model = apps.get_model('posts', name)
+        last_id = 0
+        while True:
+            batch = list(
+                model.objects.filter(id__gt=last_id).order_by('id')
+                .only('id', 'text')[:500]
+            )
+            if not batch:
+                break
+            for post in batch:
+                post.text_html = linebreaksbr(post.text, autoescape=True)
+                post.excerpt_html = truncatewords(post.text_html, 50)
+            model.objects.bulk_update(batch, ['excerpt_html', 'text_html'])
+            last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_monthlypostcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedpost',
+            name='excerpt_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Начало записи в HTML'),
+        ),
+        migrations.AddField(
+            model_name='archivedpost',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Текст записи в HTML'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Начало записи в HTML'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Текст записи в HTML'),
+        ),
+        migrations.RunPython(render, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:56
+
+import core.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_rendered_text'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedcomment',
+            name='text',
+            field=core.fields.CompressedTextField(verbose_name='Текст комментария'),
+        ),
+        migrations.AlterField(
+            model_name='archivedpost',
+            name='text',
+            field=core.fields.CompressedTextField(verbose_name='Текст записи'),
+        ),
+        migrations.AlterField(
+            model_name='archivedpost',
+            name='text_html',
+            field=core.fields.CompressedTextField(blank=True, verbose_name='Текст записи в HTML'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='text_html',
+            field=core.fields.CompressedTextField(blank=True, verbose_name='Текст записи в HTML'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-19 11:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_postrevision'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='postrevision',
+            options={'ordering': ('post_id', 'number'), 'verbose_name': 'Версия записи', 'verbose_name_plural': 'Версии записей'},
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='post',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='posts.Post', verbose_name='Запись'),
+        ),
+        migrations.AlterField(
+            model_name='postrevision',
+            name='post',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='revisions', to='posts.Post', verbose_name='Запись'),
+        ),
+    ]
@@ -1,9 +1,28 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models import Q, F
+from django.template.defaultfilters import linebreaksbr, truncatewords
+
+from core.fields import CompressedTextField
 
 User = get_user_model()
 
+EXCERPT_WORDS: int = 50
+
+
+def render_text(text):
+    """Начало записи для ленты и весь текст в HTML"""
+    html = linebreaksbr(text, autoescape=True)
+    return truncatewords(html, EXCERPT_WORDS), html
+
+
+def save_rendered(post, save, *args, update_fields=None, **kwargs):
+    if 'text' not in post.get_deferred_fields():
+        post.excerpt_html, post.text_html = render_text(post.text)
+        if update_fields is not None and 'text' in update_fields:
+            update_fields = {*update_fields, 'excerpt_html', 'text_html'}
+    save(*args, update_fields=update_fields, **kwargs)
+
 
 class Group(models.Model):
     """Модель сообщества"""
@@ -33,11 +52,21 @@ class Group(models.Model):
 class Post(models.Model):
     """Модель записи"""
     NUMBER_OF_CHAR: int = 15
+    LIST_DEFERRED: tuple = ('text', 'text_html')
 
     text = models.TextField(
         verbose_name='Текст записи',
         help_text='Разместите здесь текст'
     )
+    excerpt_html = models.TextField(
+        editable=False,
+        blank=True,
+        verbose_name='Начало записи в HTML'
+    )
+    text_html = CompressedTextField(
+        blank=True,
+        verbose_name='Текст записи в HTML'
+    )
     pub_date = models.DateTimeField(
         auto_now_add=True,
         db_index=True,
@@ -74,6 +103,9 @@ class Post(models.Model):
     def __str__(self):
         return self.text[:self.NUMBER_OF_CHAR]
 
+    def save(self, *args, **kwargs):
+        save_rendered(self, super().save, *args, **kwargs)
+
 
 class Comment(models.Model):
     """Модель комментария"""
@@ -136,3 +168,354 @@ class Follow(models.Model):
         )
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+
+
+class Recommendation(models.Model):
+    """Автор, которого стоит предложить пользователю"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='Пользователь'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рекомендуемый автор'
+    )
+    score = models.FloatField(verbose_name='Оценка')
+    mutual = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Общих подписок'
+    )
+
+    class Meta:
+        ordering = ('-score',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_recommendation'
+            ),
+        )
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+
+
+class StaleRecommendations(models.Model):
+    """Пользователь, чьи рекомендации нужно пересчитать"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='Пользователь'
+    )
+
+    class Meta:
+        verbose_name = 'Устаревшие рекомендации'
+        verbose_name_plural = 'Устаревшие рекомендации'
+
+
+class EngagementBucket(models.Model):
+    """Счётчики активности вокруг объекта за один интервал времени"""
+    POST = 'post'
+    GROUP = 'group'
+    AUTHOR = 'author'
+    KINDS = (
+        (POST, 'Запись'),
+        (GROUP, 'Сообщество'),
+        (AUTHOR, 'Автор'),
+    )
+
+    kind = models.CharField(
+        max_length=10,
+        choices=KINDS,
+        verbose_name='Тип объекта'
+    )
+    object_id = models.PositiveIntegerField(verbose_name='Id объекта')
+    bucket = models.PositiveIntegerField(
+        db_index=True,
+        verbose_name='Номер интервала'
+    )
+    comments = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Комментарии'
+    )
+    follows = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Новые подписчики'
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=['kind', 'object_id', 'bucket'],
+                name='unique_engagement_bucket'
+            ),
+        )
+        verbose_name = 'Активность'
+        verbose_name_plural = 'Активность'
+
+
+class Notification(models.Model):
+    """
+    Уведомление подписчика о новой записи автора.
+
+    Связь с записью без каскада: при переносе в архив запись сохраняет
+    id, и уведомление остаётся на месте. null=True нужен только для
+    LEFT JOIN в select_related, чтобы такие уведомления не пропадали
+    из выборки; пустым поле не бывает.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Получатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='+',
+        verbose_name='Запись'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата уведомления'
+    )
+    is_read = models.BooleanField(default=False, verbose_name='Прочитано')
+    in_digest = models.BooleanField(
+        default=False,
+        verbose_name='Включено в дайджест'
+    )
+
+    class Meta:
+        ordering = ('-id',)
+        indexes = (
+            models.Index(fields=['user', 'id'], name='notification_inbox_idx'),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_notification'
+            ),
+        )
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+
+
+class DeletionRequest(models.Model):
+    """Удаление пользователя или сообщества, идущее в фоне порциями"""
+    USER = 'user'
+    GROUP = 'group'
+    KINDS = (
+        (USER, 'Пользователь'),
+        (GROUP, 'Сообщество'),
+    )
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершено'),
+    )
+
+    kind = models.CharField(
+        max_length=10,
+        choices=KINDS,
+        verbose_name='Что удаляется'
+    )
+    object_id = models.PositiveIntegerField(verbose_name='Id объекта')
+    label = models.CharField(max_length=200, verbose_name='Название')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус'
+    )
+    total = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Всего строк'
+    )
+    processed = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Обработано строк'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создано'
+    )
+    finished = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Завершено'
+    )
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Удаление'
+        verbose_name_plural = 'Удаления'
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.label}'
+
+
+class ArchivedPost(models.Model):
+    """Старая запись, перенесённая из горячей таблицы с прежним id"""
+    id = models.IntegerField(primary_key=True)
+    text = CompressedTextField(verbose_name='Текст записи')
+    excerpt_html = models.TextField(
+        editable=False,
+        blank=True,
+        verbose_name='Начало записи в HTML'
+    )
+    text_html = CompressedTextField(
+        blank=True,
+        verbose_name='Текст записи в HTML'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        verbose_name='Автор записи'
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='archived_posts',
+        verbose_name='Сообщество'
+    )
+    image = models.ImageField(
+        verbose_name='Картинка',
+        upload_to='posts/',
+        blank=True
+    )
+    archived = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата архивации'
+    )
+
+    class Meta:
+        ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=['author', '-pub_date'],
+                         name='archived_post_author_idx'),
+        )
+        verbose_name = 'Архивная запись'
+        verbose_name_plural = 'Архивные записи'
+
+    def __str__(self):
+        return self.text[:Post.NUMBER_OF_CHAR]
+
+    def save(self, *args, **kwargs):
+        save_rendered(self, super().save, *args, **kwargs)
+
+
+class ArchivedComment(models.Model):
+    """Комментарий архивной записи"""
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        verbose_name='Запись'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments',
+        verbose_name='Автор комментария'
+    )
+    text = CompressedTextField(verbose_name='Текст комментария')
+    created = models.DateTimeField(verbose_name='Дата создания комментария')
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Архивный комментарий'
+        verbose_name_plural = 'Архивные комментарии'
+
+    def __str__(self):
+        return self.text[:Comment.NUMBER_OF_CHAR]
+
+
+class MonthlyPostCount(models.Model):
+    """Число записей за месяц по всему сайту, сообществу или автору"""
+    SITE = 'site'
+    GROUP = 'group'
+    AUTHOR = 'author'
+    SCOPES = (
+        (SITE, 'Весь сайт'),
+        (GROUP, 'Сообщество'),
+        (AUTHOR, 'Автор'),
+    )
+
+    scope = models.CharField(
+        max_length=10,
+        choices=SCOPES,
+        verbose_name='Область'
+    )
+    scope_id = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Id сообщества или автора'
+    )
+    year = models.PositiveSmallIntegerField(verbose_name='Год')
+    month = models.PositiveSmallIntegerField(verbose_name='Месяц')
+    count = models.IntegerField(default=0, verbose_name='Записей')
+
+    class Meta:
+        ordering = ('-year', '-month')
+        constraints = (
+            models.UniqueConstraint(
+                fields=['scope', 'scope_id', 'year', 'month'],
+                name='unique_monthly_post_count'
+            ),
+        )
+        verbose_name = 'Записи за месяц'
+        verbose_name_plural = 'Записи по месяцам'
+
+
+class PostRevision(models.Model):
+    """
+    Версия текста записи.
+
+    Первая версия и каждая REVISION_SNAPSHOT_INTERVAL-я хранятся
+    целиком, остальные — разницей с предыдущей версией. Связь с записью
+    без каскада, чтобы история пережила перенос записи в архив.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='revisions',
+        verbose_name='Запись'
+    )
+    number = models.PositiveIntegerField(verbose_name='Номер версии')
+    is_snapshot = models.BooleanField(
+        default=False,
+        verbose_name='Полный текст'
+    )
+    data = CompressedTextField(verbose_name='Текст или разница')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата изменения'
+    )
+
+    class Meta:
+        ordering = ('post_id', 'number')
+        constraints = (
+            models.UniqueConstraint(
+                fields=['post', 'number'],
+                name='unique_post_revision'
+            ),
+        )
+        verbose_name = 'Версия записи'
+        verbose_name_plural = 'Версии записей'
+
+    def __str__(self):
+        return f'{self.post_id} v{self.number}'
@@ -0,0 +1,198 @@
+"""
+Рекомендации «на кого подписаться», считаемые офлайн.
+
+Граф подписок загружается в компактные массивы в формате CSR: для
+вершины i её подписки лежат в indices[indptr[i]:indptr[i + 1]].
+Кандидаты — авторы, на которых подписаны те, на кого подписан
+пользователь, и популярные авторы его сообществ. Оценка складывается
+из числа общих подписок и близости по сообществам.
+"""
+from array import array
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .models import (
+    Follow, Post, Recommendation, StaleRecommendations, User
+)
+
+GROUP_AUTHORS: int = 20
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class FollowGraph:
+    """Граф подписок в виде массивов смежности"""
+
+    def __init__(self, edges):
+        users, authors = array('q'), array('q')
+        for user_id, author_id in edges:
+            users.append(user_id)
+            authors.append(author_id)
+        self.ids = array('q', sorted(set(users) | set(authors)))
+        self.index = {node_id: i for i, node_id in enumerate(self.ids)}
+        self.indptr = array('q', [0]) * (len(self.ids) + 1)
+        for user_id in users:
+            self.indptr[self.index[user_id] + 1] += 1
+        for i in range(len(self.ids)):
+            self.indptr[i + 1] += self.indptr[i]
+        self.indices = array('q', [0]) * len(authors)
+        position = array('q', self.indptr[:-1])
+        for user_id, author_id in zip(users, authors):
+            i = self.index[user_id]
+            self.indices[position[i]] = self.index[author_id]
+            position[i] += 1
+
+    @classmethod
+    def load(cls):
+        return cls(
+            Follow.objects.values_list('user_id', 'author_id')
+            .iterator(chunk_size=settings.RECOMMENDATIONS_BATCH_SIZE)
+        )
+
+    def following(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+
+class GroupAffinity:
+    """Доли записей авторов по сообществам"""
+
+    def __init__(self, rows):
+        counts = defaultdict(Counter)
+        for author_id, group_id, posts in rows:
+            counts[author_id][group_id] = posts
+        self.shares = {}
+        group_authors = defaultdict(list)
+        for author_id, groups in counts.items():
+            total = sum(groups.values())
+            self.shares[author_id] = {
+                group_id: posts / total for group_id, posts in groups.items()
+            }
+            for group_id, posts in groups.items():
+                group_authors[group_id].append((posts, author_id))
+        self.top_authors = {
+            group_id: [author_id for _, author_id
+                       in sorted(authors, reverse=True)[:GROUP_AUTHORS]]
+            for group_id, authors in group_authors.items()
+        }
+
+    @classmethod
+    def load(cls):
+        return cls(
+            Post.objects.filter(group__isnull=False)
+            .values_list('author_id', 'group_id')
+            .annotate(posts=Count('id')).order_by()
+        )
+
+    def profile(self, user_id, followed):
+        """Интересы пользователя: его записи и записи его авторов"""
+        profile = Counter(self.shares.get(user_id, {}))
+        for author_id in followed:
+            profile.update(self.shares.get(author_id, {}))
+        total = sum(profile.values())
+        return {group_id: weight / total
+                for group_id, weight in profile.items()} if total else {}
+
+    def score(self, profile, author_id):
+        shares = self.shares.get(author_id, {})
+        return sum(weight * shares.get(group_id, 0)
+                   for group_id, weight in profile.items())
+
+
+class Recommender:
+    def __init__(self, graph, affinity):
+        self.graph = graph
+        self.affinity = affinity
+        self.limit = settings.RECOMMENDATIONS_LIMIT
+        self.group_weight = settings.RECOMMENDATION_GROUP_WEIGHT
+
+    def recommend(self, user_id):
+        """Лучшие кандидаты пользователя: [(author_id, score, mutual)]"""
+        graph = self.graph
+        i = graph.index.get(user_id)
+        direct = graph.following(i) if i is not None else ()
+        mutual = Counter()
+        for j in direct:
+            mutual.update(graph.following(j))
+        followed = {graph.ids[j] for j in direct}
+        mutual = {graph.ids[k]: count for k, count in mutual.items()}
+        profile = self.affinity.profile(user_id, followed)
+        candidates = set(mutual)
+        for group_id in profile:
+            candidates.update(self.affinity.top_authors.get(group_id, ()))
+        candidates -= followed | {user_id}
+        scored = [
+            (author_id,
+             mutual.get(author_id, 0)
+             + self.group_weight * self.affinity.score(profile, author_id),
+             mutual.get(author_id, 0))
+            for author_id in candidates
+        ]
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return [item for item in scored[:self.limit] if item[1] > 0]
+
+    def store(self, user_ids):
+        rows = [
+            Recommendation(user_id=user_id, author_id=author_id,
+                           score=score, mutual=mutual)
+            for user_id in user_ids
+            for author_id, score, mutual in self.recommend(user_id)
+        ]
+        with transaction.atomic():
+            Recommendation.objects.filter(user_id__in=user_ids).delete()
+            Recommendation.objects.bulk_create(rows)
+        return len(rows)
+
+
+def mark_stale(user_ids):
+    """Отмечает пользователей, у которых изменились подписки"""
+    StaleRecommendations.objects.bulk_create(
+        [StaleRecommendations(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+
+
+def stale_users(batch_size):
+    """Изменившиеся пользователи и все, кто на них подписан"""
+    stale = set(
+        StaleRecommendations.objects.values_list('user_id', flat=True)
+    )
+    affected = set(stale)
+    for chunk in chunks(stale, batch_size):
+        affected.update(
+            Follow.objects.filter(author_id__in=chunk)
+            .values_list('user_id', flat=True)
+        )
+    return stale, affected
+
+
+def rebuild(incremental=False):
+    """
+    Пересчитывает рекомендации и возвращает (пользователей, строк).
+
+    Инкрементальный режим обновляет только пользователей из
+    StaleRecommendations и их подписчиков; изменения сообществ
+    учитываются при полном пересчёте.
+    """
+    batch_size = settings.RECOMMENDATIONS_BATCH_SIZE
+    stale, user_ids = stale_users(batch_size)
+    if not incremental:
+        user_ids = User.objects.values_list('id', flat=True)
+    recommender = Recommender(FollowGraph.load(), GroupAffinity.load())
+    users = rows = 0
+    for chunk in chunks(list(user_ids), batch_size):
+        rows += recommender.store(chunk)
+        users += len(chunk)
+    for chunk in chunks(stale, batch_size):
+        StaleRecommendations.objects.filter(user_id__in=chunk).delete()
+    return users, rows
@@ -0,0 +1,70 @@
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.http import Http404
+
+from .models import Group
+
+VERSION_KEY = 'posts.groups.version'
+
+
+class GroupRegistry:
+    """
+    Все сообщества в памяти процесса, кроме ожидающих удаления.
+
+    Версия набора хранится в общем кеше, поэтому изменение группы в одном
+    воркере заставляет остальные перечитать таблицу при следующем обращении.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._by_slug = {}
+        self._by_id = {}
+
+    def _load(self, version):
+        from .deletion import hidden_group_ids
+        hidden = hidden_group_ids()
+        groups = list(Group.objects.all())
+        with self._lock:
+            self._by_slug = {group.slug: group for group in groups
+                             if group.id not in hidden}
+            self._by_id = {group.id: group for group in groups
+                           if group.id not in hidden}
+            self._version = version
+
+    def _ensure_fresh(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(VERSION_KEY)
+        if version != self._version:
+            self._load(version)
+
+    def get(self, slug):
+        self._ensure_fresh()
+        return self._by_slug.get(slug)
+
+    def get_by_id(self, group_id):
+        self._ensure_fresh()
+        return self._by_id.get(group_id)
+
+    def get_or_404(self, slug):
+        group = self.get(slug)
+        if group is None:
+            raise Http404(f'Сообщество {slug} не найдено')
+        return group
+
+    def attach(self, posts):
+        """Подставляет сообщества записям вместо JOIN с posts_group"""
+        for post in posts:
+            if post.group_id is not None:
+                post.group = self.get_by_id(post.group_id)
+        return posts
+
+    def invalidate(self):
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+groups = GroupRegistry()
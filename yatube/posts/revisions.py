@@ -0,0 +1,113 @@
+"""
+История правок записей.
+
+Версия 1 и каждая REVISION_SNAPSHOT_INTERVAL-я после неё хранятся
+целиком, промежуточные — списком замен по словам относительно
+предыдущей версии. Любая версия собирается из ближайшего полного
+текста и не больше чем REVISION_SNAPSHOT_INTERVAL - 1 разниц, которые
+читаются одним запросом по диапазону номеров.
+"""
+import json
+import re
+from difflib import SequenceMatcher
+
+from django.conf import settings
+
+from core.fields import decode
+from .models import PostRevision
+
+TOKENS = re.compile(r'\S+|\s+')
+
+
+def tokens(text):
+    return TOKENS.findall(text)
+
+
+def opcodes(old, new):
+    matcher = SequenceMatcher(None, old, new, autojunk=False)
+    return matcher.get_opcodes()
+
+
+def diff(old, new):
+    """Разница двух текстов: [[начало, конец, вставка], ...] по словам"""
+    old, new = tokens(old), tokens(new)
+    return json.dumps(
+        [[i1, i2, ''.join(new[j1:j2])]
+         for tag, i1, i2, j1, j2 in opcodes(old, new) if tag != 'equal'],
+        ensure_ascii=False, separators=(',', ':')
+    )
+
+
+def patch(text, delta):
+    """Применяет разницу из diff к тексту"""
+    words = tokens(text)
+    for start, end, chunk in reversed(json.loads(delta)):
+        words[start:end] = [chunk]
+    return ''.join(words)
+
+
+def compare(old, new):
+    """Куски для показа правки: [(equal|insert|delete, текст), ...]"""
+    old, new = tokens(old), tokens(new)
+    parts = []
+    for tag, i1, i2, j1, j2 in opcodes(old, new):
+        if tag in ('equal', 'delete', 'replace') and i2 > i1:
+            parts.append(('equal' if tag == 'equal' else 'delete',
+                          ''.join(old[i1:i2])))
+        if tag in ('insert', 'replace'):
+            parts.append(('insert', ''.join(new[j1:j2])))
+    return parts
+
+
+def last_number(post_id):
+    return (
+        PostRevision.objects.filter(post_id=post_id)
+        .order_by('-number').values_list('number', flat=True).first()
+    ) or 0
+
+
+def record(post, previous_text=None):
+    """
+    Сохраняет текст записи новой версией.
+
+    previous_text — текст до правки: записи, созданные до появления
+    истории, получают его первой версией.
+    """
+    number = last_number(post.id)
+    if not number and previous_text is not None:
+        PostRevision.objects.create(
+            post=post, number=1, is_snapshot=True, data=previous_text
+        )
+        number = 1
+    number += 1
+    if (number - 1) % settings.REVISION_SNAPSHOT_INTERVAL == 0:
+        delta = None
+    else:
+        delta = diff(previous_text, post.text)
+    if delta is None or len(delta) >= len(post.text):
+        return PostRevision.objects.create(
+            post=post, number=number, is_snapshot=True, data=post.text
+        )
+    return PostRevision.objects.create(post=post, number=number, data=delta)
+
+
+def text_at(post_id, number):
+    """Текст версии number или None, если её нет"""
+    rows = list(
+        PostRevision.objects.filter(
+            post_id=post_id,
+            number__range=(
+                number - settings.REVISION_SNAPSHOT_INTERVAL + 1, number
+            ),
+        ).order_by('number').values_list('number', 'is_snapshot', 'data')
+    )
+    if not rows or rows[-1][0] != number:
+        return None
+    start = max(
+        index for index, (_, is_snapshot, _) in enumerate(rows)
+        if is_snapshot
+    )
+    text = decode(rows[start][2])
+    for _, _, delta in rows[start + 1:]:
+        text = patch(text, decode(delta))
+    return text
@@ -0,0 +1,100 @@
+"""
+Счётчики записей по месяцам для архивных страниц.
+
+Обработчики сигналов Post поддерживают MonthlyPostCount для всего
+сайта, сообщества и автора, поэтому навигация по месяцам читает
+готовые строки и не группирует таблицу записей. Перенос в архив
+счётчики не меняет: архивные записи тоже показываются по месяцам.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .models import ArchivedPost, MonthlyPostCount, Post
+
+
+def local(value):
+    return timezone.localtime(value) if timezone.is_aware(value) else value
+
+
+def month_bounds(year, month):
+    """Начало месяца и начало следующего"""
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    if settings.USE_TZ:
+        start, end = timezone.make_aware(start), timezone.make_aware(end)
+    return start, end
+
+
+def scopes(author_id, group_id):
+    yield MonthlyPostCount.SITE, 0
+    yield MonthlyPostCount.AUTHOR, author_id
+    if group_id is not None:
+        yield MonthlyPostCount.GROUP, group_id
+
+
+def change(scope, scope_id, pub_date, delta):
+    """Прибавляет delta к счётчику месяца, создавая строку при нужде"""
+    pub_date = local(pub_date)
+    key = {'scope': scope, 'scope_id': scope_id,
+           'year': pub_date.year, 'month': pub_date.month}
+    MonthlyPostCount.objects.bulk_create(
+        [MonthlyPostCount(**key)], ignore_conflicts=True
+    )
+    MonthlyPostCount.objects.filter(**key).update(count=F('count') + delta)
+
+
+def record(post, delta):
+    for scope, scope_id in scopes(post.author_id, post.group_id):
+        change(scope, scope_id, post.pub_date, delta)
+
+
+def move_group(post, old_group_id):
+    """Запись сменила сообщество при редактировании"""
+    if old_group_id is not None:
+        change(MonthlyPostCount.GROUP, old_group_id, post.pub_date, -1)
+    if post.group_id is not None:
+        change(MonthlyPostCount.GROUP, post.group_id, post.pub_date, 1)
+
+
+def months(scope, scope_id=0):
+    """Навигация: [(год, месяц, число записей)] от новых к старым"""
+    return list(
+        MonthlyPostCount.objects.filter(
+            scope=scope, scope_id=scope_id, count__gt=0
+        ).values_list('year', 'month', 'count')
+    )
+
+
+def rebuild():
+    """Пересчитывает счётчики с нуля, например после bulk_create"""
+    rows = {}
+    for model in (Post, ArchivedPost):
+        queryset = model.objects.annotate(
+            year=ExtractYear('pub_date'), month=ExtractMonth('pub_date')
+        ).order_by()
+        for fields, scope in (((), MonthlyPostCount.SITE),
+                              (('author_id',), MonthlyPostCount.AUTHOR),
+                              (('group_id',), MonthlyPostCount.GROUP)):
+            grouped = queryset.values(*fields, 'year', 'month').annotate(
+                total=Count('id')
+            )
+            for row in grouped:
+                scope_id = row[fields[0]] if fields else 0
+                if scope_id is None:
+                    continue
+                key = (scope, scope_id, row['year'], row['month'])
+                rows[key] = rows.get(key, 0) + row['total']
+    with transaction.atomic():
+        MonthlyPostCount.objects.all().delete()
+        MonthlyPostCount.objects.bulk_create(
+            [MonthlyPostCount(scope=scope, scope_id=scope_id, year=year,
+                              month=month, count=count)
+             for (scope, scope_id, year, month), count in rows.items()],
+            batch_size=500,
+        )
+    return len(rows)
@@ -0,0 +1,156 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.page_cache import bump_content_version
+from . import follows, revisions, rollups
+from .models import (
+    ArchivedPost, Comment, Follow, Group, MonthlyPostCount, Post, User
+)
+from .recommendations import mark_stale
+from .registry import groups
+from .tasks import notify_followers
+from .trending import record_comment, record_follows
+
+_state = threading.local()
+
+
+@contextmanager
+def muted():
+    """Отключает обработчики на время массового переноса строк"""
+    _state.muted = True
+    try:
+        yield
+    finally:
+        _state.muted = False
+
+
+def is_muted():
+    return getattr(_state, 'muted', False)
+
+
+@contextmanager
+def pages_muted():
+    """
+    Откладывает сброс кеша страниц на время пачки изменений.
+
+    Остальные обработчики работают как обычно; версию контента
+    вызывающий код поднимает сам один раз после пачки.
+    """
+    _state.pages_muted = True
+    try:
+        yield
+    finally:
+        _state.pages_muted = False
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=User)
+def invalidate_pages(sender, **kwargs):
+    """Изменение контента сбрасывает кеш страниц"""
+    if not is_muted() and not getattr(_state, 'pages_muted', False):
+        bump_content_version()
+
+
+@receiver(post_save, sender=User)
+def invalidate_pages_on_user_change(sender, update_fields=None, **kwargs):
+    """Обновление last_login при входе не меняет страницы"""
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump_content_version()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_registry(sender, **kwargs):
+    groups.invalidate()
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_following(sender, instance, **kwargs):
+    follows.invalidate(instance.user_id)
+    mark_stale([instance.user_id])
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        record_comment(instance)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        record_follows([instance.author_id])
+
+
+@receiver(post_save, sender=Post)
+def announce_post(sender, instance, created, **kwargs):
+    """Одна задача на запись; подписчиков она обойдёт сама"""
+    if created:
+        notify_followers.delay(instance.id, dedup_key=f'notify.{instance.id}')
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, **kwargs):
+    """Сообщество и текст до правки для счётчиков и истории"""
+    if instance._state.adding or is_muted():
+        return
+    previous = (
+        Post.objects.filter(pk=instance.pk)
+        .values_list('group_id', 'text').first()
+    )
+    if previous is not None:
+        instance._previous_group_id, instance._previous_text = previous
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if is_muted():
+        return
+    if created:
+        rollups.record(instance, 1)
+        return
+    previous = getattr(instance, '_previous_group_id', instance.group_id)
+    if previous != instance.group_id:
+        rollups.move_group(instance, previous)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+def uncount_post(sender, instance, **kwargs):
+    if not is_muted():
+        rollups.record(instance, -1)
+
+
+@receiver(post_delete, sender=Group)
+def drop_group_counts(sender, instance, **kwargs):
+    MonthlyPostCount.objects.filter(
+        scope=MonthlyPostCount.GROUP, scope_id=instance.pk
+    ).delete()
+
+
+@receiver(post_delete, sender=User)
+def drop_author_counts(sender, instance, **kwargs):
+    MonthlyPostCount.objects.filter(
+        scope=MonthlyPostCount.AUTHOR, scope_id=instance.pk
+    ).delete()
+
+
+@receiver(post_save, sender=Post)
+def record_revision(sender, instance, created, **kwargs):
+    if is_muted() or 'text' in instance.get_deferred_fields():
+        return
+    if created:
+        revisions.record(instance)
+        return
+    previous = getattr(instance, '_previous_text', instance.text)
+    if previous != instance.text:
+        revisions.record(instance, previous)
@@ -0,0 +1,57 @@
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+
+from tasks.queue import task
+from .models import Follow, Notification, Post
+
+POST_THUMBNAIL = ('960x339', {'crop': 'center', 'upscale': True})
+
+
+@task()
+def generate_thumbnails(post_id):
+    """Готовит миниатюру картинки до первого показа записи"""
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is None or not post.image:
+        return
+    geometry, options = POST_THUMBNAIL
+    get_thumbnail(post.image, geometry, **options)
+
+
+@task()
+def notify_followers(post_id, after=0):
+    """
+    Раскладывает уведомление о записи по входящим подписчиков.
+
+    За один запуск обрабатывается NOTIFICATIONS_CHUNK подписчиков,
+    следующая порция ставится в очередь отдельной задачей.
+    """
+    author_id = (
+        Post.objects.filter(pk=post_id)
+        .values_list('author_id', flat=True).first()
+    )
+    if author_id is None:
+        return
+    size = settings.NOTIFICATIONS_CHUNK
+    followers = list(
+        Follow.objects.filter(author_id=author_id, user_id__gt=after)
+        .order_by('user_id').values_list('user_id', flat=True)[:size]
+    )
+    Notification.objects.bulk_create(
+        [Notification(user_id=user_id, post_id=post_id)
+         for user_id in followers],
+        ignore_conflicts=True,
+    )
+    if len(followers) == size:
+        notify_followers.delay(
+            post_id, after=followers[-1],
+            dedup_key=f'notify.{post_id}.{followers[-1]}'
+        )
+
+
+@task()
+def process_deletion(request_id):
+    """Удаляет очередные порции и перезапускает себя до завершения"""
+    from .deletion import process
+    if not process(request_id):
+        process_deletion.delay(request_id,
+                               dedup_key=f'deletion.{request_id}')
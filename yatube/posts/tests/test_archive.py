@@ -0,0 +1,105 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import revisions
+from posts.models import (
+    ArchivedComment, ArchivedPost, Comment, Notification, Post, PostRevision,
+    User
+)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.old = [
+            Post.objects.create(author=self.author, text=f'Старая {number}')
+            for number in range(3)
+        ]
+        for number, post in enumerate(self.old):
+            Comment.objects.create(post=post, author=self.reader,
+                                   text=f'Комментарий {number}')
+        for number, post in enumerate(self.old):
+            Post.objects.filter(id=post.id).update(
+                pub_date=timezone.now() - timedelta(days=400 + number)
+            )
+        self.fresh = Post.objects.create(author=self.author, text='Свежая')
+        self.client = Client()
+
+    def archive(self):
+        call_command('archive_posts', days=365, stdout=StringIO())
+
+    def test_old_posts_moved_with_comments(self):
+        """Старые записи и их комментарии переезжают в архив с id"""
+        with self.settings(ARCHIVE_BATCH_SIZE=2):
+            self.archive()
+        self.assertEqual(list(Post.objects.all()), [self.fresh])
+        self.assertEqual(
+            set(ArchivedPost.objects.values_list('id', flat=True)),
+            {post.id for post in self.old}
+        )
+        self.assertEqual(ArchivedComment.objects.count(), 3)
+        self.assertFalse(Comment.objects.exists())
+        newest = Post.objects.create(author=self.author, text='Новая')
+        self.assertGreater(newest.id, self.fresh.id)
+
+    def test_post_detail_reads_archive(self):
+        """Страница архивной записи открывается по прежнему адресу"""
+        self.archive()
+        self.client.force_login(self.reader)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.old[0].id])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['archived'])
+        self.assertEqual(response.context['posts_count'], 4)
+        content = response.content.decode()
+        self.assertIn('Комментарий 0', content)
+        self.assertNotIn('name="csrfmiddlewaretoken"', content)
+
+    def test_profile_pages_continue_into_archive(self):
+        """Профиль листает свежие записи, а за ними архивные"""
+        self.archive()
+        url = reverse('posts:profile', args=['author'])
+        with self.settings(POST_PER_PAGE=3):
+            first = self.client.get(url)
+            second = self.client.get(url, {'page': 2})
+        self.assertEqual(first.context['page_obj'].paginator.count, 4)
+        self.assertEqual(
+            [post.text for post in first.context['page_obj']],
+            ['Свежая', 'Старая 0', 'Старая 1']
+        )
+        self.assertEqual(
+            [post.text for post in second.context['page_obj']], ['Старая 2']
+        )
+
+    def test_history_and_notifications_survive_archive(self):
+        """История правок и уведомления остаются у архивной записи"""
+        post = Post.objects.get(id=self.old[0].id)
+        post.text = 'Старая 0, правка'
+        post.save()
+        Notification.objects.create(user=self.reader, post=post)
+        self.archive()
+        self.assertEqual(PostRevision.objects.filter(post_id=post.id).count(),
+                         2)
+        self.assertEqual(revisions.text_at(post.id, 1), 'Старая 0')
+        self.assertEqual(revisions.text_at(post.id, 2), 'Старая 0, правка')
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('posts:post_history', args=[post.id]), {'version': 1}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['parts'], [('equal', 'Старая 0')])
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('posts:notifications'))
+        self.assertEqual(
+            [item.post for item in response.context['notifications']],
+            [ArchivedPost.objects.get(id=post.id)]
+        )
@@ -0,0 +1,158 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import follows
+from posts.models import Follow, Group, Post
+from posts.registry import groups
+
+User = get_user_model()
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Запись')
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_cached_page_gets_personal_fragments(self):
+        """Страница из кеша содержит шапку текущего пользователя"""
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        guest_response = self.guest.get(url)
+        self.assertIn('Войти', guest_response.content.decode())
+        self.assertIsNotNone(guest_response.context)
+        response = self.reader_client.get(url)
+        content = response.content.decode()
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertIn('Пользователь: reader', content)
+        self.assertIn('data-follow-url', content)
+        self.assertNotIn('<!--hole:', content)
+        author_content = self.author_client.get(url).content.decode()
+        self.assertNotIn('data-follow-url', author_content)
+
+    def test_post_detail_personal_parts(self):
+        """Кнопка редактирования и форма комментария зависят от пользователя"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.assertNotIn('name="csrfmiddlewaretoken"',
+                         self.guest.get(url).content.decode())
+        reader_content = self.reader_client.get(url).content.decode()
+        self.assertIn('name="csrfmiddlewaretoken"', reader_content)
+        self.assertNotIn('редактировать запись', reader_content)
+        author_content = self.author_client.get(url).content.decode()
+        self.assertIn('редактировать запись', author_content)
+
+    def test_content_change_invalidates_pages(self):
+        """Новая запись сбрасывает сохранённые страницы"""
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        self.guest.get(url)
+        Post.objects.create(author=self.author, text='Новая запись')
+        response = self.guest.get(url)
+        self.assertIn('Новая запись', response.content.decode())
+
+
+class GroupRegistryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(author=cls.author, text='Запись', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_uses_registry_instead_of_join(self):
+        """Лента получает сообщества из реестра без JOIN"""
+        groups.get('group')
+        with CaptureQueriesContext(connection) as context:
+            response = Client().get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'][0].group, self.group)
+        self.assertFalse(any('posts_group' in query['sql']
+                             for query in context.captured_queries))
+
+    def test_unknown_slug_does_not_reload(self):
+        """Промах по реестру не перечитывает таблицу сообществ"""
+        groups.get('group')
+        with self.assertNumQueries(0):
+            self.assertIsNone(groups.get('missing'))
+            self.assertIsNone(groups.get_by_id(10 ** 6))
+
+    def test_registry_follows_group_changes(self):
+        """Изменение и удаление сообщества видны через реестр"""
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertEqual(groups.get('group').title, 'Новое название')
+        self.group.delete()
+        response = Client().get(
+            reverse('posts:group_list', kwargs={'slug': 'group'})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class FollowingCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.fan, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.url = reverse('posts:profile', kwargs={'username': 'author'})
+
+    def test_follow_state_is_per_user(self):
+        """Кнопка зависит от подписки текущего пользователя"""
+        response = self.client.get(self.url)
+        self.assertIn('data-following=""', response.content.decode())
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+        self.assertIn('data-following="1"',
+                      self.client.get(self.url).content.decode())
+        self.client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author'})
+        )
+        self.assertIn('data-following=""',
+                      self.client.get(self.url).content.decode())
+
+    def test_concurrent_follows_keep_both_authors(self):
+        """Две подписки из разных запросов не затирают друг друга"""
+        other = User.objects.create_user(username='other')
+        first = User.objects.get(pk=self.reader.pk)
+        second = User.objects.get(pk=self.reader.pk)
+        follows.following_ids(first)
+        follows.following_ids(second)
+        follows.follow(first, self.author)
+        follows.follow(second, other)
+        follows.follow_many(first, ['fan'])
+        fresh = User.objects.get(pk=self.reader.pk)
+        self.assertEqual(follows.following_ids(fresh),
+                         {self.author.id, other.id, self.fan.id})
+
+    def test_following_ids_are_cached(self):
+        """Множество подписок читается из кеша"""
+        self.assertEqual(follows.following_ids(self.fan), {self.author.id})
+        fan = User.objects.get(pk=self.fan.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(follows.is_following(fan, self.author.id))
@@ -0,0 +1,61 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from posts.models import Comment, Follow, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DataCommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'generate_data', users=20, groups=3, posts=60, images=2,
+            comments=80, follows=40, stdout=StringIO()
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_generate_data_creates_volumes(self):
+        """generate_data создаёт заданные объёмы данных"""
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 80)
+        self.assertEqual(Post.objects.exclude(image='').count(), 2)
+        self.assertTrue(0 < Follow.objects.count() <= 40)
+        self.assertFalse(
+            Follow.objects.filter(user=F('author')).exists()
+        )
+
+    def test_benchmark_compares_with_baseline(self):
+        """benchmark сохраняет базовую линию и сравнивает с ней"""
+        baseline = os.path.join(TEMP_MEDIA_ROOT, 'baseline.json')
+        call_command('benchmark', iterations=2, baseline=baseline,
+                     save_baseline=True, stdout=StringIO())
+        with open(baseline, encoding='utf-8') as file:
+            results = json.load(file)
+        self.assertIn('posts:index', results)
+        self.assertIn('posts:post_detail', results)
+        self.assertNotIn('posts:profile_follow', results)
+        self.assertNotIn('posts:notifications', results)
+        for name in ('posts:profile_export', 'posts:group_export'):
+            # Выгрузка дочитана: есть запросы к горячей таблице и архиву.
+            self.assertGreaterEqual(results[name]['queries'], 2)
+        out = StringIO()
+        call_command('benchmark', iterations=2, baseline=baseline,
+                     stdout=out)
+        self.assertIn('p95', out.getvalue())
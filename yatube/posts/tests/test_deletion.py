@@ -0,0 +1,121 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import archive, follows, rollups
+from posts.deletion import (
+    process, request_group_deletion, request_user_deletion
+)
+from posts.models import (
+    ArchivedPost, Comment, DeletionRequest, Follow, Group, MonthlyPostCount,
+    Notification, Post, PostRevision, Recommendation, User
+)
+from posts.registry import groups
+from tasks.queue import Worker
+
+
+class BackgroundDeletionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Сообщество', slug='doomed', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(author=self.author, text=f'Запись {number}',
+                                group=self.group)
+            for number in range(4)
+        ]
+        for post in self.posts:
+            Comment.objects.create(post=post, author=self.reader, text='!')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.author, author=self.reader)
+        self.client = Client()
+
+    def test_user_is_hidden_at_once(self):
+        """Пользователь пропадает со страниц до удаления строк"""
+        request_user_deletion(self.author)
+        self.assertTrue(Post.objects.filter(author=self.author).exists())
+        self.assertEqual(self.client.get(
+            reverse('posts:profile', args=['author'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse(
+            'posts:post_detail', args=[self.posts[0].id])).status_code, 404)
+        self.assertNotIn(
+            'Запись', self.client.get(reverse('posts:index')).content.decode()
+        )
+
+    def test_user_cannot_be_recommended_or_followed(self):
+        """Скрытого автора нет в рекомендациях и на него не подписаться"""
+        newcomer = User.objects.create_user(username='newcomer')
+        Recommendation.objects.create(user=newcomer, author=self.author,
+                                      score=1.0)
+        request_user_deletion(self.author)
+        self.client.force_login(newcomer)
+        content = self.client.get(reverse('posts:index')).content.decode()
+        self.assertNotIn(reverse('posts:profile', args=['author']), content)
+        self.assertEqual(follows.follow_many(newcomer, ['author']),
+                         {'author': 'not_found'})
+        self.assertFalse(Follow.objects.filter(user=newcomer).exists())
+
+    def test_user_rows_removed_in_batches(self):
+        """Зависимые строки удаляются порциями, затем сам пользователь"""
+        request = request_user_deletion(self.author)
+        with self.settings(DELETION_BATCH_SIZE=2,
+                           DELETION_BATCHES_PER_RUN=3):
+            self.assertFalse(process(request.pk))
+            request.refresh_from_db()
+            self.assertEqual(request.status, DeletionRequest.RUNNING)
+            self.assertEqual(request.total, 14)
+            self.assertEqual(request.processed, 5)
+            self.assertTrue(User.objects.filter(pk=self.author.pk).exists())
+            Worker().run_pending()
+        request.refresh_from_db()
+        self.assertEqual(request.status, DeletionRequest.DONE)
+        self.assertEqual(request.processed, 14)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(PostRevision.objects.exists())
+
+    def test_archived_history_removed_with_user(self):
+        """История и уведомления архивных записей удаляются с автором"""
+        post = self.posts[0]
+        post.text = 'Правка'
+        post.save()
+        Notification.objects.create(user=self.reader, post=post)
+        archive.archive(days=0)
+        self.assertTrue(PostRevision.objects.filter(post_id=post.id).exists())
+        request_user_deletion(self.author)
+        Worker().run_pending()
+        self.assertFalse(ArchivedPost.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(PostRevision.objects.exists())
+
+    def test_pages_invalidated_once_per_batch(self):
+        """Пачка сбрасывает кеш страниц один раз, счётчики верны"""
+        request = request_user_deletion(self.author)
+        with mock.patch('posts.signals.bump_content_version') as per_row, \
+                mock.patch('posts.deletion.bump_content_version') as batch, \
+                self.settings(DELETION_BATCH_SIZE=10):
+            self.assertTrue(process(request.pk))
+        self.assertEqual(batch.call_count, 5)
+        self.assertEqual(per_row.call_count, 1)
+        self.assertEqual(rollups.months(MonthlyPostCount.SITE), [])
+
+    def test_group_detached_in_batches(self):
+        """Записи сообщества отвязываются, сообщество удаляется в конце"""
+        request_group_deletion(self.group)
+        self.assertIsNone(groups.get('doomed'))
+        self.assertEqual(self.client.get(
+            reverse('posts:group_list', args=['doomed'])).status_code, 404)
+        with self.settings(DELETION_BATCH_SIZE=3):
+            Worker().run_pending()
+        self.assertFalse(Group.objects.exists())
+        self.assertEqual(Post.objects.filter(group__isnull=True).count(), 4)
+        self.assertEqual(
+            DeletionRequest.objects.get().status, DeletionRequest.DONE
+        )
@@ -0,0 +1,101 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Group, Post, User
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(author=self.author, text=f'Запись\n{number}',
+                                group=self.group if number % 2 else None)
+            for number in range(5)
+        ]
+        Comment.objects.create(post=self.posts[0], author=self.reader,
+                               text='Первый')
+        Post.objects.filter(
+            pk__in=[self.posts[0].pk, self.posts[3].pk]
+        ).update(pub_date=timezone.now() - timedelta(days=400))
+        call_command('archive_posts', days=365, stdout=StringIO())
+        self.client = Client()
+        self.url = reverse('posts:profile_export', args=('author',))
+
+    def lines(self, response):
+        content = b''.join(response.streaming_content).decode()
+        return [json.loads(line) for line in content.splitlines()]
+
+    @override_settings(EXPORT_BATCH_SIZE=2)
+    def test_jsonl_merges_hot_and_archived_posts(self):
+        """Выгрузка идёт по id через горячую таблицу и архив"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'comments': '1'})
+            records = self.lines(response)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'],
+                         'application/x-ndjson; charset=utf-8')
+        self.assertEqual([record['id'] for record in records],
+                         [post.id for post in self.posts])
+        self.assertEqual(records[0]['text'], 'Запись\n0')
+        self.assertEqual(records[0]['comments'][0]['text'], 'Первый')
+        self.assertEqual(records[1]['group'], 'group')
+        selects = [query['sql'] for query in queries.captured_queries
+                   if 'posts_post' in query['sql']
+                   or 'posts_archivedpost' in query['sql']]
+        self.assertTrue(all('OFFSET' not in sql for sql in selects))
+
+    def test_resume_from_cursor(self):
+        """Курсор after продолжает выгрузку после записи"""
+        records = self.lines(
+            self.client.get(self.url, {'after': self.posts[2].id})
+        )
+        self.assertEqual([record['id'] for record in records],
+                         [self.posts[3].id, self.posts[4].id])
+        self.assertNotIn('comments', records[0])
+
+    def test_group_csv(self):
+        response = self.client.get(
+            reverse('posts:group_export', args=('group',)), {'format': 'csv'}
+        )
+        rows = list(csv.reader(
+            b''.join(response.streaming_content).decode().splitlines(True)
+        ))
+        self.assertEqual(rows[0][:2], ['id', 'author'])
+        self.assertEqual([int(row[0]) for row in rows[1:]],
+                         [self.posts[1].id, self.posts[3].id])
+        self.assertEqual(rows[1][4], 'Запись\n1')
+
+    def test_invalid_parameters(self):
+        for params in ({'format': 'xml'}, {'after': 'x'}):
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.client.get(self.url, params).status_code, 400
+                )
+
+    def test_command_writes_file(self):
+        path = os.path.join(tempfile.mkdtemp(), 'posts.jsonl')
+        call_command('export_posts', '--author=author', batch_size=2,
+                     comments=True, output=path)
+        with open(path, encoding='utf-8') as file:
+            records = [json.loads(line) for line in file]
+        os.remove(path)
+        self.assertEqual(len(records), 5)
+        out = StringIO()
+        call_command('export_posts', '--group=group', format='csv',
+                     stdout=out)
+        self.assertEqual(len(list(csv.reader(StringIO(out.getvalue())))), 3)
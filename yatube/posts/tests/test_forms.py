@@ -8,6 +8,7 @@ from django.urls import reverse
 from django.conf import settings
 
 from posts.models import Post, Group, Comment
+from tasks.models import Job
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -85,6 +86,10 @@ class PostFormTests(TestCase):
         self.assertEqual(new_post.image, f'posts/{self.image.name}')
         self.assertRedirects(response, reverse(
             'posts:profile', kwargs={'username': self.another_user.username}))
+        self.assertTrue(Job.objects.filter(
+            name='posts.tasks.generate_thumbnails',
+            dedup_key=f'thumbnails.{new_post.id}'
+        ).exists())
 
     def test_edit_post(self):
         """Проверка редактирования записи."""
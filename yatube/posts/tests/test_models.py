@@ -32,6 +32,16 @@ class PostModelTest(TestCase):
             with self.subTest(str_value=str_value):
                 self.assertEqual(str_value, expected_value)
 
+    def test_rendered_text_follows_text(self):
+        """HTML записи пересчитывается при сохранении текста"""
+        post = Post.objects.create(author=self.user, text='<b>a</b>\nb')
+        self.assertEqual(post.text_html, '&lt;b&gt;a&lt;/b&gt;<br>b')
+        post.text = ' '.join(['слово'] * 60)
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(len(post.excerpt_html.split()), 51)
+        self.assertTrue(post.excerpt_html.endswith('…'))
+
     def test_post_verbose_name(self):
         """Verbose_name в полях совпадает с ожидаемым в моделе Post."""
         field_verboses = [
@@ -0,0 +1,128 @@
+from datetime import datetime
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import rollups
+from posts.models import ArchivedPost, Group, MonthlyPostCount, Post, User
+
+
+class MonthlyArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.other = Group.objects.create(
+            title='Другая', slug='other', description='Описание'
+        )
+        self.client = Client()
+        self.now = rollups.local(timezone.now())
+
+    def counts(self, scope, scope_id=0):
+        return [count for _, _, count in rollups.months(scope, scope_id)]
+
+    def test_counts_follow_create_edit_and_delete(self):
+        """Счётчики меняются вместе с записями"""
+        post = Post.objects.create(
+            author=self.author, text='Запись', group=self.group
+        )
+        Post.objects.create(author=self.author, text='Без группы')
+        self.assertEqual(self.counts(MonthlyPostCount.SITE), [2])
+        self.assertEqual(
+            self.counts(MonthlyPostCount.AUTHOR, self.author.id), [2]
+        )
+        self.assertEqual(self.counts(MonthlyPostCount.GROUP, self.group.id),
+                         [1])
+        post.group = self.other
+        post.save()
+        self.assertEqual(self.counts(MonthlyPostCount.GROUP, self.group.id),
+                         [])
+        self.assertEqual(self.counts(MonthlyPostCount.GROUP, self.other.id),
+                         [1])
+        post.delete()
+        self.assertEqual(self.counts(MonthlyPostCount.SITE), [1])
+        self.assertEqual(self.counts(MonthlyPostCount.GROUP, self.other.id),
+                         [])
+
+    def test_archiving_keeps_counts(self):
+        """Перенос в архив не меняет счётчики, пересчёт их не портит"""
+        post = Post.objects.create(
+            author=self.author, text='Старая', group=self.group
+        )
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=datetime(2020, 5, 10, 12)
+        )
+        rollups.rebuild()
+        call_command('archive_posts', days=365, stdout=StringIO())
+        self.assertTrue(ArchivedPost.objects.filter(pk=post.pk).exists())
+        self.assertEqual(rollups.months(MonthlyPostCount.SITE),
+                         [(2020, 5, 1)])
+        call_command('rebuild_monthly_counts', stdout=StringIO())
+        self.assertEqual(
+            rollups.months(MonthlyPostCount.GROUP, self.group.id),
+            [(2020, 5, 1)]
+        )
+
+    def test_month_page_lists_hot_and_archived_posts(self):
+        """Страница месяца показывает свежие и архивные записи"""
+        old = Post.objects.create(author=self.author, text='Старая')
+        fresh = Post.objects.create(author=self.author, text='Свежая')
+        Post.objects.create(author=self.author, text='Этот месяц')
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=datetime(2020, 5, 1, 12)
+        )
+        Post.objects.filter(pk=fresh.pk).update(
+            pub_date=datetime(2020, 5, 20, 12)
+        )
+        rollups.rebuild()
+        days = (self.now - datetime(2020, 5, 10)).days
+        call_command('archive_posts', days=days, stdout=StringIO())
+        self.assertTrue(ArchivedPost.objects.filter(pk=old.pk).exists())
+        for url in (
+            reverse('posts:archive', args=(2020, 5)),
+            reverse('posts:profile_archive', args=('author', 2020, 5)),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    [post.id for post in response.context['page_obj']],
+                    [fresh.id, old.id]
+                )
+                self.assertEqual(
+                    [item['count'] for item in response.context['months']],
+                    [1, 2]
+                )
+
+    def test_navigation_does_not_group_posts(self):
+        """Навигация по месяцам не группирует таблицу записей"""
+        Post.objects.create(author=self.author, text='Запись',
+                            group=self.group)
+        url = reverse('posts:group_archive',
+                      args=('group', self.now.year, self.now.month))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 1)
+        self.assertFalse(any(
+            'GROUP BY' in query['sql'] for query in queries.captured_queries
+        ))
+
+    def test_unknown_month_is_404(self):
+        for name, args in (
+            ('posts:archive', (2020, 13)),
+            ('posts:archive', (0, 1)),
+            ('posts:archive', (9999, 12)),
+            ('posts:archive', (10000, 1)),
+            ('posts:group_archive', ('group', 0, 1)),
+            ('posts:profile_archive', ('author', 9999, 12)),
+        ):
+            with self.subTest(name=name, args=args):
+                response = self.client.get(reverse(name, args=args))
+                self.assertEqual(response.status_code, 404)
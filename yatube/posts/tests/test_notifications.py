@@ -0,0 +1,74 @@
+from django.core import mail
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.digest import send_digests
+from posts.models import Follow, Notification, Post, User
+from tasks.models import Job
+from tasks.queue import Worker
+
+
+class NotificationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.followers = [
+            User.objects.create_user(username=f'reader{number}',
+                                     email=f'reader{number}@ya.ru')
+            for number in range(5)
+        ]
+        for follower in cls.followers:
+            Follow.objects.create(user=follower, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_new_post_is_expanded_in_chunks(self):
+        """Запись порождает одну задачу, подписчики обходятся порциями"""
+        post = Post.objects.create(author=self.author, text='Новость')
+        self.assertEqual(Job.objects.count(), 1)
+        with self.settings(NOTIFICATIONS_CHUNK=2):
+            self.assertEqual(Worker().run_pending(), 3)
+        self.assertEqual(
+            set(Notification.objects.filter(post=post)
+                .values_list('user_id', flat=True)),
+            {follower.id for follower in self.followers}
+        )
+
+    @override_settings(TASKS_EAGER=True, NOTIFICATIONS_PER_PAGE=2)
+    def test_inbox_keyset_pagination(self):
+        """Входящие листаются по id и отмечаются прочитанными"""
+        posts = [Post.objects.create(author=self.author, text=f'Запись {n}')
+                 for n in range(3)]
+        client = Client()
+        client.force_login(self.followers[0])
+        url = reverse('posts:notifications')
+        with self.assertNumQueries(3):
+            response = client.get(url)
+        shown = [item.post for item in response.context['notifications']]
+        self.assertEqual(shown, [posts[2], posts[1]])
+        response = client.get(url, {'before': response.context['next_before']})
+        self.assertEqual(
+            [item.post for item in response.context['notifications']],
+            [posts[0]]
+        )
+        self.assertIsNone(response.context['next_before'])
+        self.assertFalse(Notification.objects.filter(
+            user=self.followers[0], is_read=False).exists())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_digest_collects_unread_notifications(self):
+        """Дайджест — одно письмо на пользователя, без повторов"""
+        Post.objects.create(author=self.author, text='Первая')
+        Post.objects.create(author=self.author, text='Вторая')
+        Notification.objects.filter(user=self.followers[0]).update(
+            is_read=True
+        )
+        with self.settings(DIGEST_BATCH_SIZE=2):
+            self.assertEqual(send_digests(), 4)
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertIn('Первая', mail.outbox[0].body)
+        self.assertIn('Вторая', mail.outbox[0].body)
+        self.assertEqual(send_digests(), 0)
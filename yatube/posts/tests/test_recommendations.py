@@ -0,0 +1,81 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import recommendations
+from posts.models import (
+    Follow, Group, Post, Recommendation, StaleRecommendations, User
+)
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ('reader', 'friend', 'pal', 'popular', 'niche', 'painter')
+        cls.users = {
+            name: User.objects.create_user(username=name) for name in names
+        }
+        cls.group = Group.objects.create(
+            title='Живопись', slug='art', description='Картины'
+        )
+
+    def setUp(self):
+        cache.clear()
+        users = self.users
+        for user, author in (('reader', 'friend'), ('reader', 'pal'),
+                             ('friend', 'popular'), ('pal', 'popular'),
+                             ('friend', 'niche')):
+            Follow.objects.create(user=users[user], author=users[author])
+        Post.objects.create(author=users['pal'], text='Эскиз',
+                            group=self.group)
+        Post.objects.create(author=users['painter'], text='Холст',
+                            group=self.group)
+
+    def test_follow_graph_adjacency(self):
+        """Граф хранит подписки каждой вершины подряд"""
+        graph = recommendations.FollowGraph([(1, 2), (1, 3), (3, 2)])
+        self.assertEqual(list(graph.ids), [1, 2, 3])
+        self.assertEqual(list(graph.following(0)), [1, 2])
+        self.assertEqual(list(graph.following(1)), [])
+        self.assertEqual(list(graph.following(2)), [1])
+
+    def test_rebuild_ranks_by_mutual_and_groups(self):
+        """Общие подписки и сообщества поднимают автора в рекомендациях"""
+        call_command('recommend', stdout=StringIO())
+        rows = Recommendation.objects.filter(user=self.users['reader'])
+        self.assertEqual(
+            [(row.author.username, row.mutual) for row in rows],
+            [('popular', 2), ('niche', 1), ('painter', 0)]
+        )
+
+    def test_incremental_rebuild_updates_followers(self):
+        """Изменение подписок пересчитывает и подписчиков пользователя"""
+        call_command('recommend', stdout=StringIO())
+        self.assertFalse(StaleRecommendations.objects.exists())
+        Follow.objects.create(user=self.users['pal'],
+                              author=self.users['painter'])
+        self.assertTrue(StaleRecommendations.objects.filter(
+            user=self.users['pal']).exists())
+        users, _ = recommendations.rebuild(incremental=True)
+        self.assertEqual(users, 2)
+        self.assertEqual(
+            Recommendation.objects.get(
+                user=self.users['reader'], author=self.users['painter']
+            ).mutual, 1
+        )
+        self.assertFalse(StaleRecommendations.objects.exists())
+
+    def test_index_widget_skips_followed_authors(self):
+        """Виджет на главной показывает ещё не отслеживаемых авторов"""
+        recommendations.rebuild()
+        Follow.objects.create(user=self.users['reader'],
+                              author=self.users['niche'])
+        client = Client()
+        client.force_login(self.users['reader'])
+        content = client.get(reverse('posts:index')).content.decode()
+        self.assertIn(reverse('posts:profile', args=['popular']), content)
+        self.assertNotIn(reverse('posts:profile', args=['niche']), content)
@@ -0,0 +1,96 @@
+from django.contrib.auth.models import User as AdminUser
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import revisions
+from posts.models import Post, PostRevision, User
+
+
+@override_settings(REVISION_SNAPSHOT_INTERVAL=4)
+class RevisionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(
+            author=self.author,
+            text='Версия 0 длинной записи о котах и собаках'
+        )
+        self.texts = [self.post.text]
+        for number in range(1, 9):
+            self.post.text = (
+                f'Версия {number} длинной записи о котах и собаках'
+            )
+            self.post.save()
+            self.texts.append(self.post.text)
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_edits_stored_as_deltas_with_snapshots(self):
+        """Полный текст у версий 1, 5, 9, остальные — разницы"""
+        stored = list(self.post.revisions.values_list('number', 'is_snapshot'))
+        self.assertEqual(len(stored), 9)
+        self.assertEqual(
+            [number for number, is_snapshot in stored if is_snapshot],
+            [1, 5, 9]
+        )
+        delta = PostRevision.objects.get(post=self.post, number=2).data
+        self.assertNotIn('котах', delta)
+        self.assertIn('1', delta)
+
+    def test_every_version_reconstructed_in_one_query(self):
+        """Любая версия собирается одним запросом"""
+        for number, text in enumerate(self.texts, start=1):
+            with self.subTest(number=number):
+                with self.assertNumQueries(1):
+                    self.assertEqual(
+                        revisions.text_at(self.post.id, number), text
+                    )
+        self.assertIsNone(revisions.text_at(self.post.id, 10))
+
+    def test_unchanged_text_adds_no_revision(self):
+        self.post.save()
+        self.assertEqual(self.post.revisions.count(), 9)
+
+    def test_post_without_history_gets_original_first(self):
+        """Первая правка старой записи сохраняет исходный текст"""
+        PostRevision.objects.all().delete()
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertEqual(revisions.text_at(self.post.id, 1), self.texts[-1])
+        self.assertEqual(revisions.text_at(self.post.id, 2), 'Новый текст')
+
+    def test_patch_restores_whitespace(self):
+        old = 'Абзац один.\n\nАбзац  два, слово.'
+        new = 'Абзац первый.\n\nАбзац  два,\nслово и ещё.'
+        self.assertEqual(revisions.patch(old, revisions.diff(old, new)), new)
+
+    def test_history_page(self):
+        """Автор видит версию и правку относительно предыдущей"""
+        url = reverse('posts:post_history', args=(self.post.id,))
+        response = self.client.get(url, {'version': 3})
+        self.assertEqual(response.context['number'], 3)
+        self.assertIn(('insert', '2'), response.context['parts'])
+        self.assertIn(('delete', '1'), response.context['parts'])
+        self.assertEqual(len(response.context['history']), 9)
+        self.assertEqual(
+            self.client.get(url, {'version': 20}).status_code, 404
+        )
+        reader = Client()
+        reader.force_login(User.objects.create_user(username='reader'))
+        self.assertRedirects(
+            reader.get(url),
+            reverse('posts:post_detail', args=(self.post.id,))
+        )
+
+    def test_admin_diff_screen(self):
+        admin = AdminUser.objects.create_superuser(
+            'admin', 'admin@ya.ru', 'password'
+        )
+        self.client.force_login(admin)
+        revision = PostRevision.objects.get(post=self.post, number=6)
+        response = self.client.get(reverse(
+            'admin:posts_postrevision_change', args=(revision.pk,)
+        ))
+        self.assertContains(response, '<ins>5</ins>')
+        self.assertContains(response, '<del>4</del>')
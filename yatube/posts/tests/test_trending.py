@@ -0,0 +1,93 @@
+import time
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import follows, trending
+from posts.models import Comment, EngagementBucket, Follow, Group, Post, User
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Новости', slug='news', description='Описание'
+        )
+        cls.hot = Post.objects.create(author=cls.author, text='Горячая',
+                                      group=cls.group)
+        cls.quiet = Post.objects.create(author=cls.author, text='Тихая')
+
+    def setUp(self):
+        cache.clear()
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(post=post, author=self.reader, text='!')
+
+    def test_events_fill_buckets(self):
+        """Комментарии и подписки увеличивают счётчики интервала"""
+        self.comment(self.hot, 2)
+        Follow.objects.create(user=self.reader, author=self.author)
+        buckets = {
+            (row.kind, row.object_id): (row.comments, row.follows)
+            for row in EngagementBucket.objects.all()
+        }
+        self.assertEqual(buckets, {
+            ('post', self.hot.id): (2, 0),
+            ('group', self.group.id): (2, 0),
+            ('author', self.author.id): (0, 1),
+        })
+
+    def test_batch_follow_counts_new_followers(self):
+        """Пакетная подписка учитывается без сигналов"""
+        follows.follow_many(self.reader, ['author', 'author'])
+        follows.follow_many(self.reader, ['author'])
+        self.assertEqual(
+            EngagementBucket.objects.get(kind='author').follows, 1
+        )
+
+    def test_old_engagement_decays(self):
+        """Старая активность весит меньше свежей и уходит из окна"""
+        now = time.time()
+        bucket = trending.current_bucket(now)
+        with self.settings(TRENDING_BUCKET_SECONDS=3600,
+                           TRENDING_HALF_LIFE=3600, TRENDING_WINDOW=7200):
+            EngagementBucket.objects.create(
+                kind='post', object_id=self.hot.id, bucket=bucket - 1,
+                comments=3
+            )
+            EngagementBucket.objects.create(
+                kind='post', object_id=self.quiet.id, bucket=bucket,
+                comments=2
+            )
+            EngagementBucket.objects.create(
+                kind='post', object_id=self.quiet.id, bucket=bucket - 5,
+                comments=100
+            )
+            result = trending.rebuild(now)
+        self.assertEqual(
+            [(post['id'], post['score']) for post in result['posts']],
+            [(self.quiet.id, 2.0), (self.hot.id, 1.5)]
+        )
+        self.assertEqual(EngagementBucket.objects.count(), 2)
+
+    def test_page_reads_precomputed_list(self):
+        """Страница популярного читает готовый список из кеша"""
+        self.comment(self.hot)
+        call_command('trending', stdout=StringIO())
+        client = Client()
+        client.get(reverse('posts:trending'))
+        with self.assertNumQueries(0):
+            response = client.get(reverse('posts:trending'))
+        content = response.content.decode()
+        self.assertIn(reverse('posts:post_detail', args=[self.hot.id]),
+                      content)
+        self.assertIn(reverse('posts:group_list', args=['news']), content)
+        self.assertNotIn(reverse('posts:post_detail', args=[self.quiet.id]),
+                         content)
@@ -1,3 +1,4 @@
+import json
 import shutil
 import tempfile
 from math import ceil
@@ -89,6 +90,19 @@ class PostViewTests(TestCase):
                     response = self.authorized_user.get(reverse_name)
                 self.assertEqual(response.context['page_obj'][0], self.post)
 
+    def test_lists_do_not_load_full_text(self):
+        """Ленты берут готовое начало записи без полного текста"""
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', args=(self.group.slug,)),
+                    reverse('posts:profile', args=(self.user.username,))):
+            with self.subTest(url=url):
+                response = self.unauthorized_user.get(url)
+                post = response.context['page_obj'][0]
+                self.assertTrue(
+                    set(Post.LIST_DEFERRED) <= post.get_deferred_fields()
+                )
+                self.assertContains(response, self.post.excerpt_html)
+
     def test_post_detail_show_correct_context(self):
         """Контекст в шаблоне post_detail соответствует ожидаемому."""
         response = self.unauthorized_user.get(
@@ -256,3 +270,131 @@ class FollowTest(TestCase):
         response = self.authorized_user.get(
             reverse('posts:follow_index'))
         self.assertNotIn(post, response.context['page_obj'])
+
+
+class AjaxActionsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Запись')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(self.reader)
+        self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        self.headers = {
+            'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest',
+            'HTTP_X_CSRFTOKEN': self.client.cookies['csrftoken'].value,
+        }
+
+    def test_follow_and_unfollow_return_state(self):
+        """AJAX-подписка отвечает новым состоянием без редиректа"""
+        response = self.client.post(
+            reverse('posts:profile_follow', kwargs={'username': 'author'}),
+            **self.headers
+        )
+        self.assertEqual(response.json(), {
+            'following': True, 'followers': 1, 'following_count': 1
+        })
+        response = self.client.post(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author'}),
+            **self.headers
+        )
+        self.assertFalse(response.json()['following'])
+        self.assertFalse(Follow.objects.exists())
+
+    def test_comment_returns_rendered_fragment(self):
+        """AJAX-комментарий возвращает отрисованный фрагмент"""
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Новый комментарий'}, **self.headers
+        )
+        self.assertIn('Новый комментарий', response.json()['html'])
+        self.assertTrue(Comment.objects.filter(post=self.post).exists())
+
+    def test_ajax_requires_csrf_token(self):
+        """Без CSRF-токена AJAX-запрос отклоняется"""
+        response = self.client.post(
+            reverse('posts:profile_follow', kwargs={'username': 'author'}),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Follow.objects.exists())
+
+
+class BatchFollowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        cls.url = reverse('posts:follow_batch')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def post(self, **payload):
+        return self.client.post(
+            self.url, json.dumps(payload), content_type='application/json'
+        )
+
+    def test_follow_many_reports_each_author(self):
+        """Пакетная подписка возвращает статус по каждому имени"""
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        with self.assertNumQueries(9):
+            response = self.post(usernames=[
+                'author0', 'author1', 'author2', 'author1', 'reader', 'nobody'
+            ])
+        self.assertEqual(response.json()['results'], {
+            'author0': 'already_following',
+            'author1': 'followed',
+            'author2': 'followed',
+            'reader': 'self',
+            'nobody': 'not_found',
+        })
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 3)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'author2'})
+        )
+        self.assertIn('data-following="1"', response.content.decode())
+
+    def test_follow_many_is_idempotent(self):
+        """Повторный запрос не создаёт дублей"""
+        self.post(usernames=['author1'])
+        response = self.post(usernames=['author1'])
+        self.assertEqual(
+            response.json()['results'], {'author1': 'already_following'}
+        )
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_unfollow_many(self):
+        """Пакетная отписка удаляет только существующие подписки"""
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        response = self.post(
+            action='unfollow', usernames=['author0', 'author1']
+        )
+        self.assertEqual(response.json()['results'], {
+            'author0': 'unfollowed', 'author1': 'not_following'
+        })
+        self.assertFalse(Follow.objects.exists())
+
+    def test_invalid_payload(self):
+        """Неверный запрос отклоняется без изменений"""
+        for payload in ({}, {'usernames': 'author0'},
+                        {'usernames': ['author0'], 'action': 'block'}):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.post(**payload).status_code, 400)
+        with self.settings(FOLLOW_BATCH_LIMIT=2):
+            response = self.post(usernames=['author0', 'author1', 'author2'])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Follow.objects.exists())
@@ -0,0 +1,125 @@
+"""
+Популярное: записи, сообщества и авторы с затуханием по времени.
+
+Комментарии и подписки увеличивают счётчики в часовых интервалах
+EngagementBucket. Периодическая задача rebuild() складывает счётчики
+за окно TRENDING_WINDOW с весом 0.5 ** (возраст / TRENDING_HALF_LIFE)
+и кладёт готовые списки в кеш, так что страница читает один ключ.
+"""
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import EngagementBucket, Group, Post, User
+
+TRENDING_KEY = 'posts.trending'
+COUNTERS = ('comments', 'follows')
+
+
+def current_bucket(now=None):
+    now = time.time() if now is None else now
+    return int(now // settings.TRENDING_BUCKET_SECONDS)
+
+
+def record(kind, object_ids, counter):
+    """
+    Прибавляет по событию к счётчикам текущего интервала.
+
+    Недостающие строки вставляются с нулём и INSERT OR IGNORE, затем
+    одно UPDATE увеличивает все счётчики, так что параллельные записи
+    не теряют событий.
+    """
+    if not object_ids:
+        return
+    bucket = current_bucket()
+    EngagementBucket.objects.bulk_create(
+        [EngagementBucket(kind=kind, object_id=object_id, bucket=bucket)
+         for object_id in object_ids],
+        ignore_conflicts=True,
+    )
+    EngagementBucket.objects.filter(
+        kind=kind, bucket=bucket, object_id__in=object_ids
+    ).update(**{counter: F(counter) + 1})
+
+
+def record_comment(comment):
+    record(EngagementBucket.POST, [comment.post_id], 'comments')
+    group_id = comment.post.group_id
+    if group_id is not None:
+        record(EngagementBucket.GROUP, [group_id], 'comments')
+
+
+def record_follows(author_ids):
+    record(EngagementBucket.AUTHOR, list(author_ids), 'follows')
+
+
+def decayed_scores(now=None):
+    """Оценки объектов за окно: {kind: {object_id: score}}"""
+    latest = current_bucket(now)
+    window = settings.TRENDING_WINDOW // settings.TRENDING_BUCKET_SECONDS
+    half_life = (settings.TRENDING_HALF_LIFE
+                 / settings.TRENDING_BUCKET_SECONDS)
+    scores = defaultdict(lambda: defaultdict(float))
+    rows = EngagementBucket.objects.filter(
+        bucket__gt=latest - window
+    ).values_list('kind', 'object_id', 'bucket', *COUNTERS)
+    for kind, object_id, bucket, comments, follows in rows:
+        weight = 0.5 ** ((latest - bucket) / half_life)
+        scores[kind][object_id] += (comments + follows) * weight
+    return scores
+
+
+def top(scores, size):
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return ranked[:size]
+
+
+def rebuild(now=None):
+    """Пересчитывает популярное и удаляет интервалы вне окна"""
+    size = settings.TRENDING_SIZE
+    scores = decayed_scores(now)
+    ranked = {kind: dict(top(scores[kind], size))
+              for kind, _ in EngagementBucket.KINDS}
+    posts = (
+        Post.objects.filter(id__in=ranked[EngagementBucket.POST],
+                            author__is_active=True)
+        .select_related('author', 'group')
+    )
+    groups = Group.objects.filter(id__in=ranked[EngagementBucket.GROUP])
+    authors = User.objects.filter(id__in=ranked[EngagementBucket.AUTHOR])
+    trending = {
+        'posts': sorted(
+            ({'id': post.id, 'text': post.text[:200],
+              'author': post.author.username,
+              'group': post.group and post.group.title,
+              'score': ranked[EngagementBucket.POST][post.id]}
+             for post in posts),
+            key=lambda item: -item['score']
+        ),
+        'groups': sorted(
+            ({'slug': group.slug, 'title': group.title,
+              'score': ranked[EngagementBucket.GROUP][group.id]}
+             for group in groups),
+            key=lambda item: -item['score']
+        ),
+        'authors': sorted(
+            ({'username': author.username,
+              'name': author.get_full_name() or author.username,
+              'score': ranked[EngagementBucket.AUTHOR][author.id]}
+             for author in authors),
+            key=lambda item: -item['score']
+        ),
+    }
+    cache.set(TRENDING_KEY, trending, settings.TRENDING_CACHE_TIME)
+    window = settings.TRENDING_WINDOW // settings.TRENDING_BUCKET_SECONDS
+    EngagementBucket.objects.filter(
+        bucket__lte=current_bucket(now) - window
+    ).delete()
+    return trending
+
+
+def get_trending():
+    return cache.get(TRENDING_KEY)
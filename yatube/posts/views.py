@@ -1,11 +1,45 @@
+import json
+from datetime import MAXYEAR, MINYEAR, date
+
+from django.http import (
+    Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+)
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
+from django.template.loader import render_to_string
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 from django.core.paginator import Paginator
 from django.contrib.auth.models import User
 
-from .models import Post, Group, User, Follow
+from core.metrics import UPLOAD_LATENCY
+from core.page_cache import cache_page_with_holes
+from .archive import (
+    ChainedPosts, attach_archived, author_posts, find_post
+)
+from .models import (
+    ArchivedPost, MonthlyPostCount, Notification, Post, PostRevision, User
+)
+from .rollups import month_bounds, months
+from . import export, follows, revisions
 from .forms import PostForm, CommentForm
+from .registry import groups
+from .tasks import generate_thumbnails
+from .trending import get_trending
+
+
+def wants_json(request):
+    """POST из JavaScript получает ответ JSON вместо редиректа"""
+    return request.method == 'POST' and request.is_ajax()
+
+
+def follow_state(user, author):
+    return JsonResponse({
+        'following': follows.is_following(user, author.id),
+        'followers': author.following.count(),
+        'following_count': len(follows.following_ids(user)),
+    })
 
 
 def paginator(queryset, page_number):
@@ -13,22 +47,29 @@ def paginator(queryset, page_number):
     return paginator.get_page(page_number)
 
 
+@cache_page_with_holes(settings.PAGE_CACHE_TIME)
 def index(request):
     """Главная страница"""
     page_obj = paginator(
-        Post.objects.select_related('author', 'group'), request.GET.get('page')
+        Post.objects.select_related('author').defer(*Post.LIST_DEFERRED)
+        .filter(author__is_active=True),
+        request.GET.get('page')
     )
+    groups.attach(page_obj)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_page_with_holes(settings.PAGE_CACHE_TIME)
 def group_posts(request, slug):
     """Страница сообщества"""
-    group = get_object_or_404(Group, slug=slug)
+    group = groups.get_or_404(slug)
     page_obj = paginator(
-        group.posts.select_related('author'), request.GET.get('page')
+        group.posts.select_related('author').defer(*Post.LIST_DEFERRED)
+        .filter(author__is_active=True),
+        request.GET.get('page')
     )
     context = {
         'page_obj': page_obj,
@@ -37,37 +78,142 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_page_with_holes(settings.PAGE_CACHE_TIME)
 def profile(request, username):
     """Страница пользователя"""
-    author = get_object_or_404(User, username=username)
-    page_obj = paginator(
-        author.posts.select_related('group'), request.GET.get('page')
-    )
-    following = (
-        request.user.is_authenticated
-        and author.following.select_related('user').exists()
-    )
+    author = get_object_or_404(User, username=username, is_active=True)
+    page_obj = paginator(author_posts(author), request.GET.get('page'))
+    groups.attach(page_obj)
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@cache_page_with_holes(settings.PAGE_CACHE_TIME)
 def post_detail(request, post_id):
     """Страница записи"""
-    post = get_object_or_404(
-        Post.objects.select_related('author', 'group'), pk=post_id)
+    post = find_post(post_id)
+    if post is None:
+        raise Http404('Запись не найдена')
+    groups.attach([post])
     comments = post.comments.select_related('author')
     context = {
         'post': post,
         'comments': comments,
+        'posts_count': author_posts(post.author).count(),
+        'archived': isinstance(post, ArchivedPost),
         'form': CommentForm()
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def export_response(request, querysets, name):
+    output_format = request.GET.get('format', export.JSONL)
+    if output_format not in export.RENDERERS:
+        return HttpResponseBadRequest('Формат: jsonl или csv')
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        return HttpResponseBadRequest('after должен быть id записи')
+    records = export.records(
+        *querysets, after=after, comments=request.GET.get('comments') == '1'
+    )
+    response = StreamingHttpResponse(
+        export.render(output_format, records),
+        content_type=export.CONTENT_TYPES[output_format]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}.{output_format}"'
+    )
+    return response
+
+
+def profile_export(request, username):
+    """Выгрузка записей автора"""
+    author = get_object_or_404(User, username=username, is_active=True)
+    return export_response(
+        request, export.author_querysets(author), author.username
+    )
+
+
+def group_export(request, slug):
+    """Выгрузка записей сообщества"""
+    group = groups.get_or_404(slug)
+    return export_response(request, export.group_querysets(group), slug)
+
+
+def month_page(request, year, month, hot, archived, scope, scope_id,
+               url_name, url_args=(), context=None):
+    if (not 1 <= month <= 12 or year < MINYEAR
+            or (year, month) >= (MAXYEAR, 12)):
+        raise Http404('Такого месяца нет')
+    start, end = month_bounds(year, month)
+    posts = ChainedPosts(*(
+        queryset.filter(pub_date__gte=start, pub_date__lt=end,
+                        author__is_active=True).select_related('author')
+        .defer(*Post.LIST_DEFERRED)
+        for queryset in (hot, archived)
+    ))
+    page_obj = paginator(posts, request.GET.get('page'))
+    groups.attach(page_obj)
+    navigation = [
+        {
+            'date': date(item_year, item_month, 1),
+            'count': count,
+            'url': reverse(url_name, args=(*url_args, item_year, item_month)),
+            'active': (item_year, item_month) == (year, month),
+        }
+        for item_year, item_month, count in months(scope, scope_id)
+    ]
+    context = {
+        **(context or {}),
+        'page_obj': page_obj,
+        'month': date(year, month, 1),
+        'months': navigation,
+    }
+    return render(request, 'posts/archive.html', context)
+
+
+@cache_page_with_holes(settings.PAGE_CACHE_TIME)
+def site_archive(request, year, month):
+    """Записи всего сайта за месяц"""
+    return month_page(
+        request, year, month, Post.objects.all(), ArchivedPost.objects.all(),
+        MonthlyPostCount.SITE, 0, 'posts:archive'
+    )
+
+
+@cache_page_with_holes(settings.PAGE_CACHE_TIME)
+def group_archive(request, slug, year, month):
+    """Записи сообщества за месяц"""
+    group = groups.get_or_404(slug)
+    return month_page(
+        request, year, month, Post.objects.filter(group_id=group.id),
+        ArchivedPost.objects.filter(group_id=group.id),
+        MonthlyPostCount.GROUP, group.id, 'posts:group_archive', (slug,),
+        {'group': group}
+    )
+
+
+@cache_page_with_holes(settings.PAGE_CACHE_TIME)
+def profile_archive(request, username, year, month):
+    """Записи автора за месяц"""
+    author = get_object_or_404(User, username=username, is_active=True)
+    return month_page(
+        request, year, month, author.posts.all(), author.archived_posts.all(),
+        MonthlyPostCount.AUTHOR, author.id, 'posts:profile_archive',
+        (username,), {'author': author}
+    )
+
+
+def trending(request):
+    """Популярные записи, сообщества и авторы"""
+    context = {'trending': get_trending()}
+    return render(request, 'posts/trending.html', context)
+
+
 @login_required
 def post_create(request):
     """Страница для публикации записи"""
@@ -77,7 +223,12 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with UPLOAD_LATENCY.time():
+            post.save()
+        if post.image:
+            generate_thumbnails.delay(
+                post.id, dedup_key=f'thumbnails.{post.id}'
+            )
         return redirect('posts:profile', request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -93,23 +244,69 @@ def post_edit(request, post_id):
                         instance=post
                         )
         if form.is_valid():
-            form.save()
+            with UPLOAD_LATENCY.time():
+                form.save()
+            if 'image' in form.changed_data and post.image:
+                generate_thumbnails.delay(
+                    post.id, dedup_key=f'thumbnails.{post.id}'
+                )
             return redirect('posts:post_detail', post.id)
         return render(request, 'posts/create_post.html', {'form': form})
     return redirect('posts:post_detail', post.id)
 
 
+@login_required
+def post_history(request, post_id):
+    """История правок записи для её автора"""
+    post = find_post(post_id)
+    if post is None:
+        raise Http404('Запись не найдена')
+    if post.author_id != request.user.id:
+        return redirect('posts:post_detail', post.id)
+    history = list(
+        PostRevision.objects.filter(post_id=post.id)
+        .order_by('-number').values('number', 'created')
+    )
+    if not history:
+        raise Http404('У записи нет истории')
+    try:
+        number = int(request.GET.get('version', history[0]['number']))
+    except ValueError:
+        raise Http404('Неверный номер версии')
+    text = revisions.text_at(post.id, number)
+    if text is None:
+        raise Http404('Такой версии нет')
+    previous = revisions.text_at(post.id, number - 1) if number > 1 else None
+    context = {
+        'post': post,
+        'history': history,
+        'number': number,
+        'parts': (revisions.compare(previous, text)
+                  if previous is not None else [('equal', text)]),
+    }
+    return render(request, 'posts/history.html', context)
+
+
 @login_required
 def add_comment(request, post_id):
     """Страница добавления комментария"""
     post = get_object_or_404(
-        Post.objects.select_related('author', 'group'), pk=post_id)
+        Post.objects.only('id', 'group_id'), pk=post_id
+    )
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
         comment.save()
+        if wants_json(request):
+            html = render_to_string(
+                'posts/includes/comment_item.html', {'comment': comment},
+                request=request
+            )
+            return JsonResponse({'html': html})
+    elif wants_json(request):
+        return JsonResponse({'errors': form.errors}, status=400)
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -118,19 +315,47 @@ def follow_index(request):
     """Страница с постами авторов, на которых подписан пользователь"""
     page_obj = paginator(
         Post.objects
-            .select_related('author', 'group')
-            .filter(author__following__user=request.user),
+            .select_related('author')
+            .defer(*Post.LIST_DEFERRED)
+            .filter(author__following__user=request.user,
+                    author__is_active=True),
         request.GET.get('page')
     )
+    groups.attach(page_obj)
     return render(request, 'posts/follow.html', {'page_obj': page_obj})
 
 
+@login_required
+def notifications(request):
+    """Уведомления о новых записях избранных авторов"""
+    per_page = settings.NOTIFICATIONS_PER_PAGE
+    inbox = Notification.objects.filter(user=request.user).select_related(
+        'post__author'
+    )
+    before = request.GET.get('before', '')
+    if before.isdigit():
+        inbox = inbox.filter(id__lt=int(before))
+    items = list(inbox.order_by('-id')[:per_page + 1])
+    next_before = items[per_page - 1].id if len(items) > per_page else None
+    items = items[:per_page]
+    unread = [item.id for item in items if not item.is_read]
+    if unread:
+        Notification.objects.filter(id__in=unread).update(is_read=True)
+    context = {
+        'notifications': attach_archived(items),
+        'unread': set(unread),
+        'next_before': next_before,
+    }
+    return render(request, 'posts/notifications.html', context)
+
+
 @login_required
 def profile_follow(request, username):
     """Страница, чтобы подписаться на автора"""
     author = get_object_or_404(User, username=username)
-    if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+    follows.follow(request.user, author)
+    if wants_json(request):
+        return follow_state(request.user, author)
     return redirect('posts:profile', author)
 
 
@@ -138,5 +363,34 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     """Страница, чтобы отписаться от автора"""
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    follows.unfollow(request.user, author)
+    if wants_json(request):
+        return follow_state(request.user, author)
     return redirect('posts:profile', username)
+
+
+@login_required
+@require_POST
+def follow_batch(request):
+    """Подписка или отписка сразу от нескольких авторов"""
+    try:
+        payload = json.loads(request.body)
+        usernames = payload['usernames']
+        action = payload.get('action', 'follow')
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'error': 'Ожидается JSON с usernames'},
+                            status=400)
+    if (not isinstance(usernames, list)
+            or not all(isinstance(name, str) for name in usernames)
+            or action not in ('follow', 'unfollow')):
+        return JsonResponse({'error': 'Неверный формат запроса'}, status=400)
+    if len(usernames) > settings.FOLLOW_BATCH_LIMIT:
+        return JsonResponse(
+            {'error': f'Не больше {settings.FOLLOW_BATCH_LIMIT} авторов'},
+            status=400
+        )
+    if action == 'follow':
+        results = follows.follow_many(request.user, usernames)
+    else:
+        results = follows.unfollow_many(request.user, usernames)
+    return JsonResponse({'results': results})
@@ -0,0 +1,31 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from core.metrics import REGISTRY
+from tasks.queue import Worker
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркер фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2,
+                            help='Число потоков')
+        parser.add_argument('--poll-interval', type=float,
+                            help='Пауза между опросами пустой очереди')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        worker = Worker(options['concurrency'], options['poll_interval'])
+        if options['once']:
+            processed = worker.run_pending()
+            REGISTRY.flush()
+            self.stdout.write(f'Выполнено задач: {processed}')
+            return
+        signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+        self.stdout.write(
+            f'Воркер запущен, потоков: {options["concurrency"]}'
+        )
+        worker.run()
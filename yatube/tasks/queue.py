@@ -0,0 +1,221 @@
+"""
+Очередь фоновых задач в основной базе данных.
+
+Задача объявляется декоратором @task и ставится в очередь вызовом
+delay(). Воркер (manage.py runworker) забирает строки Job сравнением
+со старым статусом в UPDATE, поэтому одну задачу не возьмут двое.
+Упавшая задача повторяется с экспоненциальной паузой, пока не
+кончатся попытки. В режиме TASKS_EAGER задачи выполняются сразу.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from core.metrics import REGISTRY, TASK_LATENCY, TASKS_PROCESSED
+from .models import Job
+
+logger = logging.getLogger('yatube.tasks')
+
+_registry = {}
+
+
+class Task:
+    def __init__(self, function, name, priority, max_attempts):
+        self.function = function
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.function(*args, **kwargs)
+
+    def delay(self, *args, dedup_key=None, priority=None, countdown=0,
+              **kwargs):
+        """Ставит вызов в очередь и возвращает Job (None в режиме eager)"""
+        return enqueue(
+            self.name, args, kwargs, dedup_key=dedup_key,
+            priority=self.priority if priority is None else priority,
+            countdown=countdown, max_attempts=self.max_attempts
+        )
+
+
+def task(name=None, priority=0, max_attempts=None):
+    """Регистрирует функцию как фоновую задачу"""
+    def decorator(function):
+        task_name = name or f'{function.__module__}.{function.__name__}'
+        _registry[task_name] = Task(
+            function, task_name, priority,
+            max_attempts or settings.TASKS_MAX_ATTEMPTS
+        )
+        return _registry[task_name]
+    return decorator
+
+
+def enqueue(name, args=(), kwargs=None, dedup_key=None, priority=0,
+            countdown=0, max_attempts=None):
+    """
+    Добавляет задачу в очередь.
+
+    Если в очереди уже ждёт задача с тем же dedup_key, новая не
+    создаётся и возвращается ожидающая.
+    """
+    kwargs = kwargs or {}
+    if settings.TASKS_EAGER:
+        _registry[name](*args, **kwargs)
+        return None
+    job = Job(
+        name=name,
+        payload=json.dumps({'args': list(args), 'kwargs': kwargs}),
+        priority=priority,
+        dedup_key=dedup_key,
+        max_attempts=max_attempts or settings.TASKS_MAX_ATTEMPTS,
+        run_after=timezone.now() + timedelta(seconds=countdown),
+    )
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        if dedup_key is None:
+            raise
+        return Job.objects.filter(
+            dedup_key=dedup_key, status=Job.QUEUED
+        ).first()
+    return job
+
+
+def backoff(attempts):
+    """Пауза перед повтором: base * 2 ** (попытка - 1) с разбросом"""
+    delay = settings.TASKS_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи воркеров, переставших отвечать"""
+    deadline = timezone.now() - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=deadline
+    ).update(status=Job.QUEUED, locked_by='', locked_at=None)
+
+
+def claim(worker_id):
+    """Забирает самую приоритетную готовую задачу или None"""
+    while True:
+        now = timezone.now()
+        candidate = (
+            Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+            .order_by('-priority', 'run_after', 'id')
+            .values_list('id', flat=True).first()
+        )
+        if candidate is None:
+            return None
+        taken = Job.objects.filter(id=candidate, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker_id, locked_at=now
+        )
+        if taken:
+            return Job.objects.get(id=candidate)
+
+
+def run_job(job):
+    """Выполняет задачу и записывает результат или план повтора"""
+    payload = json.loads(job.payload)
+    job.attempts += 1
+    try:
+        with TASK_LATENCY.time(task=job.name):
+            _registry[job.name](*payload['args'], **payload['kwargs'])
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(
+                seconds=backoff(job.attempts)
+            )
+            result = 'retry'
+        else:
+            job.status = Job.FAILED
+            job.finished = timezone.now()
+            result = 'failed'
+        logger.warning('Задача %s упала (попытка %s)', job, job.attempts,
+                       exc_info=True)
+    else:
+        job.status = Job.DONE
+        job.finished = timezone.now()
+        result = 'done'
+    job.locked_by = ''
+    job.locked_at = None
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        # Повтор не нужен: такая же задача уже снова ждёт в очереди.
+        job.status = Job.FAILED
+        job.finished = timezone.now()
+        job.save()
+    TASKS_PROCESSED.inc(task=job.name, result=result)
+    return result
+
+
+class Worker:
+    """Несколько потоков, разбирающих очередь"""
+
+    def __init__(self, concurrency=1, poll_interval=None):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval or settings.TASKS_POLL_INTERVAL
+        self.stopping = threading.Event()
+        self.prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+    def run_pending(self, worker_id=None):
+        """Выполняет задачи, пока они есть; возвращает их число"""
+        worker_id = worker_id or f'{self.prefix}:0'
+        processed = 0
+        requeue_stale()
+        while not self.stopping.is_set():
+            job = claim(worker_id)
+            if job is None:
+                break
+            run_job(job)
+            processed += 1
+        return processed
+
+    def loop(self, number):
+        worker_id = f'{self.prefix}:{number}'
+        while not self.stopping.is_set():
+            close_old_connections()
+            try:
+                processed = self.run_pending(worker_id)
+            except Exception:
+                logger.exception('Ошибка воркера %s', worker_id)
+                processed = 0
+            REGISTRY.flush_if_due()
+            if not processed:
+                self.stopping.wait(self.poll_interval)
+        close_old_connections()
+
+    def run(self):
+        threads = [
+            threading.Thread(target=self.loop, args=(number,), daemon=True)
+            for number in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stop()
+            for thread in threads:
+                thread.join()
+        REGISTRY.flush()
+
+    def stop(self):
+        self.stopping.set()
+        REGISTRY.flush()
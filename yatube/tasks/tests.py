@@ -0,0 +1,120 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import metrics
+from tasks.models import Job
+from tasks.queue import Worker, claim, enqueue, run_job, task
+
+calls = []
+
+
+@task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='tests.flaky', max_attempts=2)
+def flaky():
+    raise RuntimeError('сбой')
+
+
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_creates_job_and_worker_runs_it(self):
+        """delay ставит задачу, воркер её выполняет"""
+        job = record.delay('значение')
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(calls, [])
+        self.assertEqual(Worker().run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(calls, ['значение'])
+
+    def test_priority_and_delay_order(self):
+        """Сначала выполняются приоритетные задачи, отложенные ждут"""
+        record.delay('обычная')
+        record.delay('срочная', priority=10)
+        record.delay('позже', countdown=60)
+        Worker().run_pending()
+        self.assertEqual(calls, ['срочная', 'обычная'])
+
+    def test_dedup_key_keeps_single_queued_job(self):
+        """Одинаковый ключ дедупликации не плодит задачи в очереди"""
+        first = record.delay(1, dedup_key='same')
+        second = record.delay(2, dedup_key='same')
+        self.assertEqual(first.pk, second.pk)
+        Worker().run_pending()
+        third = record.delay(3, dedup_key='same')
+        self.assertNotEqual(first.pk, third.pk)
+
+    def test_failed_job_retries_with_backoff(self):
+        """Упавшая задача повторяется позже, затем помечается ошибкой"""
+        job = flaky.delay()
+        with self.assertLogs('yatube.tasks', 'WARNING'):
+            self.assertEqual(run_job(claim('test')), 'retry')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('RuntimeError', job.last_error)
+        self.assertIsNone(claim('test'))
+        Job.objects.update(run_after=timezone.now())
+        with self.assertLogs('yatube.tasks', 'WARNING'):
+            self.assertEqual(run_job(claim('test')), 'failed')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_stale_running_job_is_requeued(self):
+        """Задача зависшего воркера возвращается в очередь"""
+        job = record.delay('снова')
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING,
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(Worker().run_pending(), 1)
+        self.assertEqual(calls, ['снова'])
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        """В режиме eager задача выполняется сразу"""
+        self.assertIsNone(enqueue('tests.record', ['сразу']))
+        self.assertEqual(calls, ['сразу'])
+        self.assertFalse(Job.objects.exists())
+
+
+class WorkerCommandTests(TransactionTestCase):
+    def test_runworker_once(self):
+        """runworker --once выполняет готовые задачи и завершается"""
+        calls.clear()
+        for value in range(3):
+            record.delay(value)
+        output = StringIO()
+        call_command('runworker', once=True, stdout=output)
+        self.assertIn('3', output.getvalue())
+        self.assertEqual(sorted(calls), [0, 1, 2])
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+
+    def test_runworker_once_flushes_metrics(self):
+        """Метрики задач попадают в общее хранилище из процесса воркера"""
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'metrics.sqlite3')
+        with self.settings(METRICS_DB=path):
+            metrics.REGISTRY.reset()
+            record.delay(1)
+            call_command('runworker', once=True, stdout=StringIO())
+            with sqlite3.connect(path) as connection:
+                rows = connection.execute(
+                    'SELECT labels, value FROM metric_samples '
+                    'WHERE name = ?', ('yatube_tasks_processed_total',)
+                ).fetchall()
+        shutil.rmtree(directory, ignore_errors=True)
+        self.assertIn(('task="tests.record",result="done"', 1.0), rows)
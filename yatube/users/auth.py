@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib import auth
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+
+USER_KEY = 'auth.user.{}'
+
+
+def user_key(user_id):
+    return USER_KEY.format(user_id)
+
+
+def invalidate_user(user_id):
+    cache.delete(user_key(user_id))
+
+
+def get_cached_user(request):
+    """
+    Пользователь сессии без запроса к auth_user.
+
+    В кеше хранится пара (хеш пароля для сессии, пользователь), поэтому
+    после смены пароля старая запись не подходит ни одной сессии.
+    """
+    session = request.session
+    user_id = session.get(auth.SESSION_KEY)
+    backend = session.get(auth.BACKEND_SESSION_KEY)
+    session_hash = session.get(auth.HASH_SESSION_KEY)
+    if (user_id is None or not session_hash
+            or backend not in settings.AUTHENTICATION_BACKENDS):
+        return auth.get_user(request)
+    key = user_key(user_id)
+    cached = cache.get(key)
+    if cached is not None:
+        stamp, user = cached
+        if constant_time_compare(stamp, session_hash):
+            user.backend = backend
+            return user
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(
+            key, (user.get_session_auth_hash(), user), settings.USER_CACHE_TIME
+        )
+    return user
@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+User = get_user_model()
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='reader', password='old-password-123'
+        )
+        self.client = Client()
+        self.client.login(username='reader', password='old-password-123')
+
+    def test_authentication_without_queries(self):
+        """Повторный запрос не обращается к БД ради сессии и пользователя"""
+        url = reverse('about:author')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_password_change_invalidates_cached_user(self):
+        """После смены пароля старая сессия больше не авторизует"""
+        url = reverse('about:author')
+        self.client.get(url)
+        self.user.set_password('new-password-456')
+        self.user.save()
+        response = self.client.get(url)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_logout_invalidates_cached_user(self):
+        """Выход удаляет пользователя из кеша"""
+        self.client.get(reverse('about:author'))
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(f'auth.user.{self.user.pk}'))
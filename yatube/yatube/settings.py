@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -38,15 +42,19 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'tasks.apps.TasksConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.SlowQueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.middleware.CachedAuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -110,16 +118,29 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+
+USER_CACHE_TIME: int = 60 * 60
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
 
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+
+EMAIL_DELIVERY_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+EMAIL_BATCH_SIZE: int = 50
+EMAIL_MAX_ATTEMPTS: int = 5
+EMAIL_RETRY_BACKOFF: int = 60
+EMAIL_SEND_TIMEOUT: int = 10 * 60
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
@@ -128,8 +149,128 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 5,
+            'SYNC_INTERVAL': 0.5,
+        },
     }
 }
 
 CACH_TIME: int = 20
+
+PAGE_CACHE_TIME: int = 60
+
+FOLLOWING_CACHE_TIME: int = 60 * 60
+
+FOLLOW_BATCH_LIMIT: int = 100
+
+RECOMMENDATIONS_LIMIT: int = 10
+RECOMMENDATIONS_SHOWN: int = 5
+RECOMMENDATION_GROUP_WEIGHT: float = 1.0
+RECOMMENDATIONS_BATCH_SIZE: int = 500
+
+TRENDING_BUCKET_SECONDS: int = 60 * 60
+TRENDING_HALF_LIFE: int = 6 * 60 * 60
+TRENDING_WINDOW: int = 3 * 24 * 60 * 60
+TRENDING_SIZE: int = 20
+TRENDING_CACHE_TIME: int = 60 * 60
+
+TASKS_EAGER: bool = False
+TASKS_MAX_ATTEMPTS: int = 3
+TASKS_RETRY_BACKOFF: int = 10
+TASKS_POLL_INTERVAL: float = 1.0
+TASKS_LOCK_TIMEOUT: int = 10 * 60
+
+NOTIFICATIONS_CHUNK: int = 500
+NOTIFICATIONS_PER_PAGE: int = 20
+DIGEST_BATCH_SIZE: int = 200
+DIGEST_MAX_POSTS: int = 20
+
+SITE_URL: str = 'http://localhost:8000'
+
+DELETION_BATCH_SIZE: int = 500
+DELETION_BATCHES_PER_RUN: int = 20
+
+ARCHIVE_AFTER_DAYS: int = 365
+ARCHIVE_BATCH_SIZE: int = 500
+
+COMPRESSED_TEXT_THRESHOLD: int = 512
+COMPRESSED_TEXT_LEVEL: int = 6
+COMPRESSED_TEXT_BATCH_SIZE: int = 500
+
+REVISION_SNAPSHOT_INTERVAL: int = 10
+
+EXPORT_BATCH_SIZE: int = 500
+
+THUMBNAIL_KVSTORE = 'core.thumbnail.KVStore'
+
+THUMBNAIL_ENGINE = 'core.thumbnail.Engine'
+
+METRICS_DB = os.path.join(BASE_DIR, 'metrics.sqlite3')
+
+METRICS_FLUSH_INTERVAL: float = 1.0
+
+METRICS_DB_TIMEOUT: float = 0.25
+
+# Проверяется REMOTE_ADDR: за локальным обратным прокси все клиенты
+# приходят с 127.0.0.1, поэтому там нужно задать METRICS_TOKEN.
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+# Если задан, /metrics требует заголовок Authorization: Bearer <токен>
+# вместо проверки адреса.
+METRICS_TOKEN: str = ''
+
+SLOW_QUERY_THRESHOLD_MS: int = 100
+
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'slow_queries.log')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': 5 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'yatube.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+PROFILING_TOP: int = 50
+
+PROFILING_TRACEMALLOC_FRAMES: int = 10
+
+PROFILING_DIR = None
+
+WARMUP_ON_STARTUP: bool = not DEBUG
+
+WARMUP_GROUPS: int = 5
+
+# Тесты (manage.py test и pytest) не должны трогать файлы кеша и метрик
+# запущенного dev-сервера: cache.clear() в тестах стёр бы его кеш.
+TESTING: bool = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+if TESTING:
+    TEST_DATA_DIR = tempfile.mkdtemp(prefix='yatube-tests-')
+    atexit.register(shutil.rmtree, TEST_DATA_DIR, True)
+    CACHES['default']['LOCATION'] = os.path.join(
+        TEST_DATA_DIR, 'cache.sqlite3'
+    )
+    METRICS_DB = os.path.join(TEST_DATA_DIR, 'metrics.sqlite3')